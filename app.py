@@ -1,25 +1,71 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from db import get_connection
+from db import get_connection, init_app, pool_stats, PoolTimeout
+import commands
+from utils import metrics
+from utils.payroll_jobs import start_job, resume_job, get_job, JobConflict
+from models.salary_report import get_report as get_salary_report, get_total as get_salary_total
+from utils.passwords import check_password, generate_password, hash_password, password_pool_stats, PasswordCheckBusy
+from utils.cache import cache
+from models.user_model import USER_COLUMNS, get_all_staff, invalidate_staff_cache, register_users
+from utils.export import export_format, stream_query
+from utils.json_provider import FastJSONProvider
+from utils.rows import RecordCursor
+from utils.pagination import fetch_limit, history_args, history_filter, split_page, CURSOR_HEADER
+from models.attendance_summary import get_month_summary
+from models.attendance_model import update_check_out
+from models.versions import conditional_response
+from utils.group_commit import check_in, group_commit_stats, CheckInPending
+from utils import shift_policy
+from utils.attendance_import import import_csv, ImportUnsupported
+from controllers.attendance_controller import attendance_bp
+from controllers.auth_controller import auth_bp
+from controllers.salary_controller import salary_bp
+from controllers.user_controller import user_bp
 from datetime import datetime
 from dotenv import load_dotenv
-import bcrypt
-import random
-import string
+import csv
+import io
 import os
 import psycopg2.extras
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app, supports_credentials=True, origins=[
+ONBOARD_MAX_ROWS = int(os.getenv("ONBOARD_MAX_ROWS", "2000"))
+
+# Also applied to the native routes in asgi.py
+CORS_ORIGINS = [
     "https://attendence-backend-ewp8.onrender.com",                         # local dev
-    "ephemeral-jalebi-66afe3.netlify.app"       # production domain
-])
+    "https://ephemeral-jalebi-66afe3.netlify.app"       # production domain
+]
+
+app = Flask(__name__)
+app.json = FastJSONProvider(app)
+CORS(app, supports_credentials=True, origins=CORS_ORIGINS, expose_headers=[CURSOR_HEADER])
+init_app(app)
+commands.init_app(app)
+metrics.init_app(app)
+app.register_blueprint(user_bp, url_prefix="/user")
+app.register_blueprint(attendance_bp)
+app.register_blueprint(auth_bp, url_prefix="/auth")
+app.register_blueprint(salary_bp, url_prefix="/salary")
+
+
+@app.errorhandler(PoolTimeout)
+def db_pool_timeout(e):
+    return jsonify({"message": "Server busy, please retry"}), 503
 
 
-def generate_password(length=6):
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+# The batch may still commit the row, so the client must not assume it failed
+@app.errorhandler(CheckInPending)
+def check_in_pending(e):
+    return jsonify({"message": "Check-in status unknown, please check your attendance before retrying"}), 503
+
+
+@app.errorhandler(PasswordCheckBusy)
+def login_busy(e):
+    return jsonify({"status": "fail", "message": "Too many login attempts, please retry"}), 503, {"Retry-After": "1"}
+
 
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -34,7 +80,7 @@ def login():
     cur.close()
     conn.close()
 
-    if user and bcrypt.checkpw(password.encode(), user['password'].encode()):
+    if user and check_password(password, user['password']):
         return jsonify({"status": "success", "user": user})
     else:
         return jsonify({"status": "fail", "message": "Invalid credentials"}), 401
@@ -48,35 +94,61 @@ def add_staff():
     cur.execute("""
         INSERT INTO users (name, email, phone, age, batch, salary, password, role)
         VALUES (%s, %s, %s, %s, %s, %s, %s, 'user')
+        ON CONFLICT (email) DO NOTHING
     """, (
         data['name'], data['email'], data['phone'], data.get('age'),
-        data.get('batch'), data['salary'], password
+        data.get('batch'), data['salary'], hash_password(password)
     ))
+    created = cur.rowcount > 0
     conn.commit()
     cur.close()
     conn.close()
+    if not created:
+        return jsonify({"message": "A user with this email already exists"}), 409
+    invalidate_staff_cache()
     return jsonify({"message": "Staff added successfully", "password": password})
 
+# Onboard a batch of staff: a JSON list (or {"staff": [...]}), or a CSV with a
+# name,email,phone,age,batch,salary header as a multipart "file" or the raw body.
+# Always 200 with one result per row; see register_users for the statuses.
+@app.route('/api/add-staff/bulk', methods=['POST'])
+def add_staff_bulk():
+    if request.is_json:
+        staff = request.get_json()
+        if isinstance(staff, dict):
+            staff = staff.get('staff')
+    else:
+        stream = request.files['file'].stream if 'file' in request.files else request.stream
+        try:
+            staff = list(csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig')))
+        except (UnicodeDecodeError, csv.Error):
+            return jsonify({"error": "Expected a UTF-8 CSV file"}), 400
+    if not isinstance(staff, list) or not staff:
+        return jsonify({"error": "Expected a non-empty list of staff"}), 400
+    if len(staff) > ONBOARD_MAX_ROWS:
+        return jsonify({"error": f"At most {ONBOARD_MAX_ROWS} staff per request"}), 413
+    results = register_users(staff)
+    return jsonify({
+        "created": sum(r["status"] == "created" for r in results),
+        "failed": sum(r["status"] != "created" for r in results),
+        "results": results,
+    })
+
 @app.route('/admin/staff', methods=['GET'])
 def all_staff():
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT * FROM users WHERE role='user'")
-    result = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify(result)
+    fmt = export_format(request.args)
+    if fmt:
+        return stream_query(f"SELECT {USER_COLUMNS} FROM users WHERE role='user' ORDER BY id", (), fmt, "staff",
+                            request.args.get('itersize', type=int))
+    return jsonify(get_all_staff())
 
 @app.route('/admin/total-salary', methods=['GET'])
 def total_salary():
     now = datetime.now()
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT SUM(final_salary) AS total FROM salary_logs WHERE month=%s AND year=%s", (now.month, now.year))
-    result = cur.fetchone()
-    cur.close()
-    conn.close()
-    return jsonify({"total": float(result[0]) if result[0] else 0})
+    year = request.args.get('year', now.year, type=int)
+    month = request.args.get('month', now.month, type=int)
+    batch = request.args.get('batch')
+    return jsonify({"total": get_salary_total(year, month, batch)})
 
 @app.route('/user/checkin', methods=['POST'])
 def checkin():
@@ -85,18 +157,10 @@ def checkin():
     now = datetime.now()
     today = now.date()
     time_now = now.time()
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM attendance WHERE user_id=%s AND date=%s", (user_id, today))
-    already = cur.fetchone()
-    if already:
+    late = shift_policy.is_late(user_id, time_now)
+    inserted = check_in(user_id, today, {"checkin_time": time_now, "is_late": late})
+    if not inserted:
         return jsonify({"message": "Already checked in today."}), 400
-    late = time_now > datetime.strptime("09:30", "%H:%M").time()
-    cur.execute("INSERT INTO attendance (user_id, date, checkin_time, is_late) VALUES (%s, %s, %s, %s)",
-                (user_id, today, time_now, late))
-    conn.commit()
-    cur.close()
-    conn.close()
     return jsonify({"message": "Check-in successful", "late": late})
 
 @app.route('/user/checkout', methods=['POST'])
@@ -106,86 +170,158 @@ def checkout():
     now = datetime.now()
     today = now.date()
     time_now = now.time()
+    early = shift_policy.is_early_leave(user_id, time_now)
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM attendance WHERE user_id=%s AND date=%s", (user_id, today))
-    record = cur.fetchone()
-    if not record:
-        return jsonify({"message": "Check-in not found."}), 404
-    if record[3]:
-        return jsonify({"message": "Already checked out today."}), 400
-    early = time_now < datetime.strptime("18:00", "%H:%M").time()
-    cur.execute("UPDATE attendance SET checkout_time=%s, is_early_leave=%s WHERE user_id=%s AND date=%s",
-                (time_now, early, user_id, today))
+    status = update_check_out(cur, user_id, today, {"checkout_time": time_now, "is_early_leave": early},
+                              "checkout_time")
     conn.commit()
     cur.close()
     conn.close()
+    if status == "missing":
+        return jsonify({"message": "Check-in not found."}), 404
+    if status == "done":
+        return jsonify({"message": "Already checked out today."}), 400
     return jsonify({"message": "Check-out successful", "early_leave": early})
 
+# Payroll runs as a background job; poll the status URL for progress.
+# ?wait=1 keeps the old behaviour for existing callers: block until the job is
+# done and answer 200 with the row count and timing.
 @app.route('/admin/calculate-salary', methods=['POST'])
 def calculate_salary():
     data = request.get_json()
-    month = data['month']
-    year = data['year']
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT id, salary AS salary_per_month FROM users WHERE role='user'")
-    users = cur.fetchall()
-    for user in users:
-        uid = user['id']
-        monthly_salary = float(user['salary_per_month'])
-        per_day = monthly_salary / 30
-        cur.execute("SELECT * FROM attendance WHERE user_id=%s AND EXTRACT(MONTH FROM date)=%s AND EXTRACT(YEAR FROM date)=%s",
-                    (uid, month, year))
-        logs = cur.fetchall()
-        late_deduction = early_deduction = 0
-        for log in logs:
-            if log['is_late']:
-                late_deduction += per_day * 0.2
-            if log['is_early_leave']:
-                early_deduction += per_day * 0.2
-        total_cut = late_deduction + early_deduction
-        final = monthly_salary - total_cut
-        cur.execute("""
-            INSERT INTO salary_logs (user_id, month, year, base_salary, late_deductions, early_deductions, final_salary)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (uid, month, year, monthly_salary, late_deduction, early_deduction, final))
-    conn.commit()
-    cur.close()
-    conn.close()
-    return jsonify({"message": "Salary calculated for all users"})
+    month = int(data['month'])
+    year = int(data['year'])
+    wait = request.args.get('wait') in ('1', 'true')
+    try:
+        job_id = start_job(month, year, wait=wait)
+    except JobConflict as e:
+        return jsonify({"message": "Payroll for this month is already running", "job_id": e.args[0]}), 409
+    if wait:
+        job = get_job(job_id)
+        if job["status"] != "done":
+            return jsonify({"message": "Salary calculation failed", "job_id": job_id, "error": job["error"]}), 500
+        elapsed = job["elapsed_seconds"]
+        return jsonify({
+            "message": "Salary calculated for all users",
+            "job_id": job_id,
+            "rows": job["users_done"],
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "rows_per_sec": job["users_per_sec"]
+        })
+    return jsonify({
+        "message": "Payroll job started",
+        "job_id": job_id,
+        "status_url": f"/admin/payroll-jobs/{job_id}"
+    }), 202
+
+@app.route('/admin/payroll-jobs/<int:job_id>', methods=['GET'])
+def payroll_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/admin/payroll-jobs/<int:job_id>/resume', methods=['POST'])
+def payroll_job_resume(job_id):
+    if get_job(job_id) is None:
+        return jsonify({"message": "Job not found"}), 404
+    try:
+        resume_job(job_id)
+    except JobConflict:
+        return jsonify({"message": "Job is still running or already finished", "job_id": job_id}), 409
+    return jsonify({"message": "Payroll job resumed", "job_id": job_id}), 202
+
+@app.route('/admin/shift-policies', methods=['GET'])
+def shift_policies():
+    return jsonify(shift_policy.list_policies())
+
+# Times as "HH:MM"; batch "*" is the default policy
+@app.route('/admin/shift-policies/<batch>', methods=['PUT'])
+def set_shift_policy(batch):
+    data = request.get_json()
+    try:
+        shift_policy.set_policy(
+            batch,
+            datetime.strptime(data['start_time'], "%H:%M").time(),
+            datetime.strptime(data['end_time'], "%H:%M").time(),
+            int(data.get('late_grace_minutes', 10)),
+            int(data.get('early_grace_minutes', 10)),
+        )
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Shift policy saved", "batch": batch})
+
+@app.route('/admin/shift-policies/<batch>', methods=['DELETE'])
+def delete_shift_policy(batch):
+    try:
+        deleted = shift_policy.delete_policy(batch)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not deleted:
+        return jsonify({"message": "No policy for this batch"}), 404
+    return jsonify({"message": "Shift policy deleted", "batch": batch})
+
+# Apply the current policies to a month of existing attendance
+@app.route('/admin/shift-policies/reevaluate', methods=['POST'])
+def reevaluate_shift_policies():
+    data = request.get_json()
+    return jsonify(shift_policy.reevaluate_month(int(data['year']), int(data['month'])))
+
+# CSV of user_id,date,check_in,check_out as a multipart "file" field or as the raw
+# request body; ?header=0 if the file has no header line
+@app.route('/admin/attendance/import', methods=['POST'])
+def import_attendance():
+    file = request.files['file'].stream if 'file' in request.files else request.stream
+    try:
+        result = import_csv(file, header=request.args.get('header', '1') != '0')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ImportUnsupported as e:
+        return jsonify({"error": str(e)}), 501
+    return jsonify(result)
 
 @app.route('/api/user-attendance/<int:user_id>', methods=['GET'])
 def get_user_attendance(user_id):
+    return conditional_response("attendance_version", user_id, lambda: _user_attendance(user_id))
+
+def _user_attendance(user_id):
+    try:
+        args = history_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    extra, params = history_filter(args['before'], args['start'], args['end'])
     conn = get_connection()
-    cur = conn.cursor()
+    cur = conn.cursor(cursor_factory=RecordCursor)
+    # Display formatting happens in SQL so rows serialize as-is
     cur.execute("""
-        SELECT date, checkin_time, checkout_time, is_late, is_early_leave
+        SELECT date,
+               COALESCE(checkin_time::text, '-') AS checkin_time,
+               COALESCE(checkout_time::text, '-') AS checkout_time,
+               is_late, is_early_leave
         FROM attendance
-        WHERE user_id = %s
+        WHERE user_id = %s""" + extra + """
         ORDER BY date DESC
-    """, (user_id,))
-    rows = cur.fetchall()
-    result = [
-        {
-            "date": row[0].strftime("%Y-%m-%d"),
-            "checkin_time": str(row[1]) if row[1] else "-",
-            "checkout_time": str(row[2]) if row[2] else "-",
-            "is_late": row[3],
-            "is_early_leave": row[4],
-        }
-        for row in rows
-    ]
+        LIMIT %s
+    """, [user_id, *params, fetch_limit(args['limit'])])
+    result, next_cursor = split_page(cur.fetchall(), args['limit'], lambda row: row['date'])
     cur.close()
     conn.close()
-    return jsonify(result)
+    response = jsonify(result)
+    if next_cursor:
+        response.headers[CURSOR_HEADER] = next_cursor
+    return response
 
 @app.route('/api/user-salary/<int:user_id>', methods=['GET'])
 def get_user_salary(user_id):
+    return conditional_response("salary_version", user_id, lambda: _user_salary(user_id))
+
+def _user_salary(user_id):
     conn = get_connection()
-    cur = conn.cursor()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     cur.execute("""
-        SELECT month, year, base_salary, late_deductions, early_deductions, final_salary
+        SELECT month, year, base_salary::float8 AS base_salary, late_deductions::float8 AS late_deductions,
+               early_deductions::float8 AS early_deductions, final_salary::float8 AS final_salary
         FROM salary_logs
         WHERE user_id = %s
         ORDER BY year DESC, month DESC
@@ -196,63 +332,101 @@ def get_user_salary(user_id):
     conn.close()
     if not result:
         return jsonify({"error": "No salary record found"}), 404
-    return jsonify({
-        "month": result[0],
-        "year": result[1],
-        "base_salary": float(result[2]),
-        "late_deductions": float(result[3]),
-        "early_deductions": float(result[4]),
-        "final_salary": float(result[5])
-    })
+    return jsonify(result)
 
 @app.route('/api/staff', methods=['GET'])
 def get_staff():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, email, phone, age, batch, salary, role FROM users WHERE role='user'")
-    rows = cur.fetchall()
-    result = [
-        {
-            "id": row[0], "name": row[1], "email": row[2],
-            "phone": row[3], "age": row[4], "batch": row[5],
-            "salary": float(row[6]), "status": row[7]
-        }
-        for row in rows
-    ]
-    cur.close()
-    conn.close()
-    return jsonify(result)
+    fmt = export_format(request.args)
+    if fmt:
+        return stream_query("""
+            SELECT id, name, email, phone, age, batch, salary::float8 AS salary, role AS status
+            FROM users WHERE role='user' ORDER BY id
+        """, (), fmt, "staff", request.args.get('itersize', type=int))
+    return jsonify(cache.get_or_load("staff:api", _load_staff))
 
-@app.route('/api/salary-report', methods=['GET'])
-def salary_report():
+def _load_staff():
     conn = get_connection()
-    cur = conn.cursor()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     cur.execute("""
-        SELECT u.name, s.base_salary, s.late_deductions + s.early_deductions AS total_deductions, s.final_salary
-        FROM salary_logs s
-        JOIN users u ON s.user_id = u.id
-        WHERE s.month = EXTRACT(MONTH FROM CURRENT_DATE) AND s.year = EXTRACT(YEAR FROM CURRENT_DATE)
+        SELECT id, name, email, phone, age, batch, salary::float8 AS salary, role AS status
+        FROM users WHERE role='user'
     """)
-    rows = cur.fetchall()
-    total_spent = sum(float(row[3]) for row in rows)
-    report = [
-        {
-            "name": row[0],
-            "base_salary": float(row[1]),
-            "total_deductions": float(row[2]),
-            "final_salary": float(row[3])
-        }
-        for row in rows
-    ]
+    result = [dict(row) for row in cur.fetchall()]
     cur.close()
     conn.close()
-    return jsonify({"report": report, "total_spent": total_spent})
+    return result
+
+@app.route('/api/salary-report', methods=['GET'])
+def salary_report():
+    fmt = export_format(request.args)
+    if fmt:
+        # Export mode: a whole year (default current) or one month of salary logs
+        year = request.args.get('year', datetime.now().year, type=int)
+        month = request.args.get('month', type=int)
+        sql = """
+            SELECT s.user_id, u.name, s.month, s.year, s.base_salary,
+                   s.late_deductions + s.early_deductions AS total_deductions, s.final_salary
+            FROM salary_logs s
+            JOIN users u ON s.user_id = u.id
+            WHERE s.year = %s
+        """
+        params = [year]
+        if month:
+            sql += " AND s.month = %s"
+            params.append(month)
+        return stream_query(sql + " ORDER BY s.month, s.user_id", params, fmt, "salary-report",
+                            request.args.get('itersize', type=int))
+    now = datetime.now()
+    year = request.args.get('year', now.year, type=int)
+    month = request.args.get('month', now.month, type=int)
+    batch = request.args.get('batch')
+    report, totals, overall = get_salary_report(year, month, batch)
+    if batch is not None:
+        overall = totals.get(batch)
+    return jsonify({
+        "month": month,
+        "year": year,
+        "report": report,
+        "total_spent": overall["total_spent"] if overall else 0,
+        "totals_by_batch": totals
+    })
+
+@app.route('/admin/attendance-summary', methods=['GET'])
+def attendance_summary():
+    now = datetime.now()
+    year = request.args.get('year', now.year, type=int)
+    month = request.args.get('month', now.month, type=int)
+    user_id = request.args.get('user_id', type=int)
+    return jsonify(get_month_summary(year, month, user_id))
+
+@app.route('/admin/db-pool', methods=['GET'])
+def db_pool():
+    return jsonify(pool_stats())
+
+@app.route('/admin/login-pool', methods=['GET'])
+def login_pool():
+    return jsonify(password_pool_stats())
+
+@app.route('/admin/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(cache.stats())
+
+@app.route('/admin/group-commit', methods=['GET'])
+def group_commit():
+    return jsonify(group_commit_stats())
+
+# Everything but the password hash
+TEST_USER_COLUMNS = "id, name, email, phone, age, batch, salary, salary_per_month, role"
 
 @app.route("/test")
 def test():
+    fmt = export_format(request.args)
+    if fmt:
+        return stream_query(f"SELECT {TEST_USER_COLUMNS} FROM users ORDER BY id", (), fmt, "users",
+                            request.args.get('itersize', type=int))
     conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT * FROM users")
+    cur = conn.cursor(cursor_factory=RecordCursor)
+    cur.execute(f"SELECT {TEST_USER_COLUMNS} FROM users")
     data = cur.fetchall()
     cur.close()
     conn.close()
@@ -0,0 +1,257 @@
+# asgi.py
+#
+# Async serving mode:  uvicorn asgi:app --workers 2
+#
+# Read-heavy routes (attendance history, salary, staff list, salary report) are
+# served natively on asyncpg with their own pool, so a slow mobile client only
+# holds a coroutine instead of a whole worker. Every other route (check-in/out,
+# login, payroll, admin tools, the controllers/ blueprints) falls through to the
+# Flask app running in a thread pool, so both modes serve the same URLs. CORS
+# for the native routes comes from CORSMiddleware with the Flask app's origins.
+
+from contextlib import asynccontextmanager
+from datetime import datetime
+import hashlib
+import os
+
+import asyncpg
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, CORS_ORIGINS
+from models.versions import GLOBAL_ROW
+from utils.json_provider import dumps_bytes
+from utils.pagination import fetch_limit, history_args, CURSOR_HEADER
+
+ASYNC_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "2"))
+ASYNC_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "20"))
+WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "16"))
+
+pool = None
+
+
+def _connect_kwargs():
+    host = os.getenv("DB_HOST")
+    if host and host.startswith(("postgres://", "postgresql://")):
+        return {"dsn": host}
+    return {"host": host}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global pool
+    pool = await asyncpg.create_pool(min_size=ASYNC_POOL_MIN, max_size=ASYNC_POOL_MAX, **_connect_kwargs())
+    try:
+        yield
+    finally:
+        await pool.close()
+
+
+class JSON(JSONResponse):
+    def render(self, content):
+        return dumps_bytes(content)
+
+
+def _error(message, status):
+    return JSON({"error": message}, status_code=status)
+
+
+# Same ETag scheme as models/versions.conditional_response
+async def _conditional(request, column, user_id, build):
+    row = await pool.fetchrow(f"""
+        SELECT COALESCE(MAX({column}) FILTER (WHERE user_id = $1), 0) AS u,
+               COALESCE(MAX({column}) FILTER (WHERE user_id = $2), 0) AS g
+        FROM resource_versions
+        WHERE user_id IN ($1, $2)
+    """, user_id, GLOBAL_ROW)
+    args = hashlib.sha1(request.url.query.encode()).hexdigest()[:8]
+    etag = f'W/"{column.split("_")[0]}-{user_id}-{row["u"]}.{row["g"]}-{args}"'
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response = await build()
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+    return response
+
+
+async def _history(request, columns):
+    user_id = int(request.path_params["user_id"])
+    try:
+        args = history_args(request.query_params)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    sql = f"SELECT {columns} FROM attendance WHERE user_id = $1"
+    params = [user_id]
+    for cond, value in (("date < ", args["before"]), ("date >= ", args["start"]), ("date <= ", args["end"])):
+        if value is not None:
+            params.append(value)
+            sql += f" AND {cond}${len(params)}"
+    params.append(fetch_limit(args["limit"]))
+    rows = await pool.fetch(sql + f" ORDER BY date DESC LIMIT ${len(params)}", *params)
+
+    headers = {}
+    if args["limit"] is not None and len(rows) > args["limit"]:
+        rows = rows[:args["limit"]]
+        headers[CURSOR_HEADER] = rows[-1]["date"].isoformat()
+    return JSON([dict(row) for row in rows], headers=headers)
+
+
+async def api_user_attendance(request):
+    user_id = int(request.path_params["user_id"])
+    return await _conditional(request, "attendance_version", user_id, lambda: _history(
+        request, """date, COALESCE(checkin_time::text, '-') AS checkin_time,
+                    COALESCE(checkout_time::text, '-') AS checkout_time, is_late, is_early_leave"""))
+
+
+async def user_attendance(request):
+    user_id = int(request.path_params["user_id"])
+    return await _conditional(request, "attendance_version", user_id, lambda: _history(
+        request, "date, check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave"))
+
+
+async def api_user_salary(request):
+    user_id = int(request.path_params["user_id"])
+
+    async def build():
+        row = await pool.fetchrow("""
+            SELECT month, year, base_salary::float8 AS base_salary, late_deductions::float8 AS late_deductions,
+                   early_deductions::float8 AS early_deductions, final_salary::float8 AS final_salary
+            FROM salary_logs
+            WHERE user_id = $1
+            ORDER BY year DESC, month DESC
+            LIMIT 1
+        """, user_id)
+        if not row:
+            return _error("No salary record found", 404)
+        return JSON(dict(row))
+    return await _conditional(request, "salary_version", user_id, build)
+
+
+async def user_salary(request):
+    user_id = int(request.path_params["user_id"])
+
+    async def build():
+        row = await pool.fetchrow("""
+            SELECT * FROM salary
+            WHERE user_id = $1
+            ORDER BY year DESC, month DESC
+            LIMIT 1
+        """, user_id)
+        if not row:
+            return _error("No salary record found", 404)
+        return JSON(dict(row))
+    return await _conditional(request, "salary_version", user_id, build)
+
+
+async def api_staff(request):
+    rows = await pool.fetch("""
+        SELECT id, name, email, phone, age, batch, salary::float8 AS salary, role AS status
+        FROM users WHERE role = 'user'
+    """)
+    return JSON([dict(row) for row in rows])
+
+
+async def salary_report(request):
+    now = datetime.now()
+    try:
+        year = int(request.query_params.get("year", now.year))
+        month = int(request.query_params.get("month", now.month))
+    except ValueError:
+        return _error("'month' and 'year' must be integers", 400)
+    batch = request.query_params.get("batch")
+
+    sql = """
+        SELECT user_id, name, batch, base_salary, total_deductions, final_salary
+        FROM salary_report_monthly
+        WHERE year = $1 AND month = $2
+    """
+    params = [year, month]
+    if batch is not None:
+        sql += " AND COALESCE(batch, '') = $3"
+        params.append(batch)
+    rows = await pool.fetch(sql + " ORDER BY name", *params)
+    totals = {
+        row["batch"]: dict(row) for row in await pool.fetch("""
+            SELECT batch, employees, total_base, total_deductions, total_spent, refreshed_at
+            FROM salary_report_totals
+            WHERE year = $1 AND month = $2
+        """, year, month)
+    }
+    if batch is not None:
+        overall = totals.get(batch)
+    else:
+        overall = await pool.fetchrow("""
+            SELECT total_spent FROM salary_report_overall
+            WHERE year = $1 AND month = $2
+        """, year, month)
+    return JSON({
+        "month": month,
+        "year": year,
+        "report": [dict(row) for row in rows],
+        "total_spent": overall["total_spent"] if overall else 0,
+        "totals_by_batch": totals
+    })
+
+
+async def total_salary(request):
+    now = datetime.now()
+    try:
+        year = int(request.query_params.get("year", now.year))
+        month = int(request.query_params.get("month", now.month))
+    except ValueError:
+        return _error("'month' and 'year' must be integers", 400)
+    batch = request.query_params.get("batch")
+    if batch is None:
+        total = await pool.fetchval("""
+            SELECT total_spent FROM salary_report_overall
+            WHERE year = $1 AND month = $2
+        """, year, month)
+    else:
+        total = await pool.fetchval("""
+            SELECT total_spent FROM salary_report_totals
+            WHERE year = $1 AND month = $2 AND batch = $3
+        """, year, month, batch)
+    return JSON({"total": total or 0})
+
+
+# Export formats (?format=ndjson|csv) are handled by the Flask side
+class _UnlessExport:
+    def __init__(self, handler):
+        self.handler = handler
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if request.query_params.get("format"):
+            await wsgi(scope, receive, send)
+            return
+        response = await self.handler(request)
+        await response(scope, receive, send)
+
+
+wsgi = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+app = Starlette(
+    routes=[
+        Route("/api/user-attendance/{user_id:int}", api_user_attendance),
+        Route("/user/attendance/{user_id:int}", user_attendance),
+        Route("/api/user-salary/{user_id:int}", api_user_salary),
+        Route("/user/salary/{user_id:int}", user_salary),
+        Route("/api/staff", _UnlessExport(api_staff)),
+        Route("/api/salary-report", _UnlessExport(salary_report)),
+        Route("/admin/total-salary", total_salary),
+        Mount("/", app=wsgi),
+    ],
+    # Preflights are answered here; on Flask responses the headers replace Flask-CORS's
+    middleware=[Middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_credentials=True,
+                           allow_methods=["*"], allow_headers=["*"], expose_headers=[CURSOR_HEADER])],
+    lifespan=lifespan,
+)
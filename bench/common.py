@@ -0,0 +1,106 @@
+# common.py
+#
+# Shared helpers for the bench/ scripts: starting a server subprocess, waiting
+# for it, recording latencies per route and summarising them as JSON-friendly dicts.
+
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVERS = {
+    "wsgi": ["gunicorn", "app:app", "--workers", "{workers}", "--bind", "127.0.0.1:{port}"],
+    "asgi": ["uvicorn", "asgi:app", "--workers", "{workers}", "--port", "{port}", "--log-level", "warning"],
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(pct / 100 * (len(values) - 1)))))
+    return round(values[k] * 1000, 2)
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+# Latencies and error counts keyed by route label ("POST /user/checkin")
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+
+    async def request(self, client, label, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] = self.errors.get(label, 0) + 1
+            return None
+        if response.status_code >= 500:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        else:
+            self.latencies.setdefault(label, []).append(time.perf_counter() - start)
+        return response
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        labels = sorted(set(self.latencies) | set(self.errors))
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "routes": {
+                label: summarize(self.latencies.get(label, []), self.errors.get(label, 0), elapsed)
+                for label in labels
+            },
+        }
+
+
+def wait_ready(base_url, path="/api/staff", timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(base_url + path, timeout=2)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.3)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+def start_server(mode, workers, port):
+    cmd = [part.format(workers=workers, port=port) for part in SERVERS[mode]]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url)
+    except Exception:
+        stop_server(proc)
+        raise
+    return proc, base_url
+
+
+def stop_server(proc):
+    proc.terminate()
+    proc.wait(10)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,103 @@
+# compare_servers.py
+#
+# Side-by-side load test of the two serving modes against the same database:
+#   WSGI:  gunicorn app:app            (sync workers)
+#   ASGI:  uvicorn asgi:app            (asyncpg for read routes)
+#
+#   python bench/compare_servers.py --workers 2 --concurrency 200 --duration 20
+#
+# Each mode is started as a subprocess, warmed up, then hammered by
+# --concurrency async clients cycling through read routes for --duration
+# seconds. Results (throughput, p50/p95/p99, errors) are printed as JSON.
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+from common import percentile, start_server, stop_server
+
+
+def read_paths(user_ids):
+    uid = random.choice(user_ids)
+    return random.choice([
+        f"/api/user-attendance/{uid}?limit=30",
+        f"/api/user-salary/{uid}",
+        "/api/staff",
+        "/api/salary-report",
+    ])
+
+
+async def drive(base_url, user_ids, concurrency, duration, client_delay):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(read_paths(user_ids))
+                    if response.status_code >= 500:
+                        errors += 1
+                    else:
+                        latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+                # Simulated think time / slow client between requests
+                if client_delay:
+                    await asyncio.sleep(client_delay)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+def run_mode(mode, args, user_ids):
+    proc, base_url = start_server(mode, args.workers, args.port)
+    try:
+        asyncio.run(drive(base_url, user_ids, min(args.concurrency, 20), 2, 0))  # warm-up
+        return asyncio.run(drive(base_url, user_ids, args.concurrency, args.duration, args.client_delay))
+    finally:
+        stop_server(proc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare WSGI and ASGI serving modes")
+    parser.add_argument("--modes", default="wsgi,asgi")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--client-delay", type=float, default=0.0, help="seconds each client idles between requests")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--users", default="1-50", help="user id range to query, e.g. 1-500")
+    args = parser.parse_args()
+
+    lo, hi = (int(x) for x in args.users.split("-"))
+    user_ids = list(range(lo, hi + 1))
+
+    results = {"config": vars(args), "results": {}}
+    for mode in args.modes.split(","):
+        results["results"][mode] = run_mode(mode, args, user_ids)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# json_serialization.py
+#
+# Micro-benchmark for response encoding, no database or server needed:
+#
+#   python bench/json_serialization.py --rows 10000 --repeat 20
+#
+# Encodes --rows synthetic attendance rows (date, time, Decimal, bool) the way
+# the handlers used to (format every field in Python, then stdlib json) and the
+# way they do now (rows straight into utils.json_provider.dumps_bytes), and
+# prints the best time of --repeat runs for each as JSON.
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+from decimal import Decimal
+
+from common import git_revision
+from utils import json_provider
+
+
+def make_rows(n):
+    start = date(2024, 1, 1)
+    return [
+        {
+            "date": start + timedelta(days=i % 365),
+            "checkin_time": dtime(9, i % 60, i % 60),
+            "checkout_time": dtime(17, i % 60, 0) if i % 7 else None,
+            "late_deductions": Decimal("125.50") + i % 10,
+            "is_late": i % 3 == 0,
+            "is_early_leave": i % 5 == 0,
+        }
+        for i in range(n)
+    ]
+
+
+def legacy(rows):
+    return json.dumps([
+        {
+            "date": row["date"].strftime("%Y-%m-%d"),
+            "checkin_time": str(row["checkin_time"]) if row["checkin_time"] else "-",
+            "checkout_time": str(row["checkout_time"]) if row["checkout_time"] else "-",
+            "late_deductions": float(row["late_deductions"]),
+            "is_late": row["is_late"],
+            "is_early_leave": row["is_early_leave"],
+        }
+        for row in rows
+    ]).encode()
+
+
+def provider(rows):
+    return json_provider.dumps_bytes(rows)
+
+
+def best_of(fn, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"best_ms": round(best * 1000, 2), "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row formatting + json with the JSON provider")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    results = {
+        "revision": git_revision(),
+        "rows": args.rows,
+        "orjson": json_provider.orjson is not None,
+        "legacy": best_of(legacy, rows, args.repeat),
+        "provider": best_of(provider, rows, args.repeat),
+    }
+    results["speedup"] = round(results["legacy"]["best_ms"] / results["provider"]["best_ms"], 1)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# row_memory.py
+#
+# Memory cost of a large attendance read per row representation:
+#
+#   python bench/row_memory.py --rows 1000000
+#
+# Fetches --rows attendance-shaped rows (generated by generate_series, so no
+# seeding is needed; --table reads the real attendance table instead) with a
+# plain tuple cursor, RealDictCursor, utils.rows.RecordCursor and
+# utils.rows.fetch_columns, and reports the Python heap held by the result and
+# the peak during the fetch (tracemalloc), plus wall time from a separate
+# untraced run. The libpq result buffer is outside the Python heap and the
+# same for every mode.
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import psycopg2.extras
+
+from common import git_revision
+from db import get_connection
+from utils.rows import RecordCursor, fetch_columns
+
+COLUMNS = "user_id, date, check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave"
+
+SYNTHETIC_SQL = """
+    SELECT n %% 5000 + 1 AS user_id,
+           DATE '2024-01-01' + n / 5000 AS date,
+           TIME '09:00' + (n %% 3600) * INTERVAL '1 second' AS check_in,
+           TIME '17:00' + (n %% 7200) * INTERVAL '1 second' AS check_out,
+           GREATEST(0, n %% 60 - 40) AS late_minutes,
+           GREATEST(0, n %% 50 - 40) AS early_minutes,
+           TRUE AS is_present,
+           n %% 100 = 0 AS is_paid_leave
+    FROM generate_series(0, %s - 1) AS n
+"""
+
+TABLE_SQL = f"SELECT {COLUMNS} FROM attendance LIMIT %s"
+
+
+def fetch(mode, sql, rows):
+    conn = get_connection()
+    factory = {"realdict": psycopg2.extras.RealDictCursor, "record": RecordCursor}.get(mode)
+    cursor = conn.cursor(cursor_factory=factory) if factory else conn.cursor()
+    cursor.execute(sql, (rows,))
+    result = fetch_columns(cursor) if mode == "columns" else cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return result
+
+
+def measure(mode, sql, rows):
+    gc.collect()
+    start = time.perf_counter()
+    result = fetch(mode, sql, rows)
+    elapsed = time.perf_counter() - start
+    fetched = len(result["user_id"]) if mode == "columns" else len(result)
+    del result
+    gc.collect()
+
+    tracemalloc.start()
+    result = fetch(mode, sql, rows)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        "rows": fetched,
+        "seconds": round(elapsed, 2),
+        "held_mb": round(held / 2 ** 20, 1),
+        "peak_mb": round(peak / 2 ** 20, 1),
+        "bytes_per_row": round(held / fetched) if fetched else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory of row representations for large reads")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--modes", default="tuple,realdict,record,columns")
+    parser.add_argument("--table", action="store_true", help="read the attendance table instead of synthetic rows")
+    args = parser.parse_args()
+
+    sql = TABLE_SQL if args.table else SYNTHETIC_SQL
+    results = {"revision": git_revision(), "rows": args.rows, "source": "attendance" if args.table else "synthetic",
+               "modes": {}}
+    for mode in args.modes.split(","):
+        results["modes"][mode] = measure(mode, sql, args.rows)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# run.py
+#
+# Scenario load test for the attendance API:
+#
+#   python bench/seed.py --staff 500 --months 3
+#   python bench/run.py --workers 2 --concurrency 50 --out bench-$(git rev-parse --short HEAD).json
+#
+# Boots gunicorn app:app (or uses --url for a server that is already running)
+# against the database in the environment and runs each scenario in turn:
+#
+#   checkin_burst   every bench user checks in at once, like the 9:30 rush
+#   login_storm     --requests logins spread over the bench users
+#   history         --requests app sessions: three pages of attendance history + latest salary
+#   payroll         --payroll-runs month-end /admin/calculate-salary jobs, waited to completion
+#
+# Output is JSON with per-route throughput and p50/p95/p99 latency per
+# scenario, plus the git revision, so runs can be diffed across commits.
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import date
+
+import httpx
+
+from common import Recorder, git_revision, start_server, stop_server
+from db import get_connection
+from models import attendance_summary
+from seed import BENCH_DOMAIN, BENCH_PASSWORD, bench_users
+
+SCENARIOS = ["checkin_burst", "login_storm", "history", "payroll"]
+
+
+# Run job(i) for i in range(total) with at most `concurrency` in flight
+async def fan_out(total, concurrency, job):
+    jobs = iter(range(total))
+
+    async def worker():
+        for i in jobs:
+            await job(i)
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+
+
+async def checkin_burst(client, rec, users, args):
+    # Clear today's check-ins so the burst is repeatable
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        DELETE FROM attendance
+        WHERE date = CURRENT_DATE AND user_id IN (SELECT id FROM users WHERE email LIKE '%%@{BENCH_DOMAIN}')
+    """)
+    conn.commit()
+    conn.close()
+    today = date.today()
+    attendance_summary.rebuild(today.year, today.month)
+
+    order = random.sample(users, len(users))
+
+    async def job(i):
+        await rec.request(client, "POST /user/checkin", "POST", "/user/checkin", json={"user_id": order[i][0]})
+
+    await fan_out(len(order), args.concurrency, job)
+
+
+async def login_storm(client, rec, users, args):
+    async def job(i):
+        _, email = random.choice(users)
+        await rec.request(client, "POST /api/login", "POST", "/api/login",
+                          json={"email": email, "password": BENCH_PASSWORD})
+
+    await fan_out(args.requests, args.concurrency, job)
+
+
+async def history(client, rec, users, args):
+    async def job(i):
+        user_id, _ = random.choice(users)
+        url = f"/api/user-attendance/{user_id}?limit=30"
+        for _ in range(3):
+            response = await rec.request(client, "GET /api/user-attendance/<id>", "GET", url)
+            cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+            if not cursor:
+                break
+            url = f"/api/user-attendance/{user_id}?limit=30&before={cursor}"
+        await rec.request(client, "GET /api/user-salary/<id>", "GET", f"/api/user-salary/{user_id}")
+
+    await fan_out(args.requests, args.concurrency, job)
+
+
+# Each run is timed from the POST until the background job reports done
+async def payroll(client, rec, users, args):
+    today = date.today()
+    year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+    for _ in range(args.payroll_runs):
+        start = time.perf_counter()
+        response = await rec.request(client, "POST /admin/calculate-salary", "POST", "/admin/calculate-salary",
+                                     json={"month": month, "year": year})
+        if response is None or response.status_code != 202:
+            continue
+        status_url = response.json()["status_url"]
+        while True:
+            await asyncio.sleep(0.2)
+            job = (await client.get(status_url)).json()
+            if job["status"] not in ("pending", "running"):
+                break
+        if job["status"] == "done":
+            rec.latencies.setdefault("payroll job (end to end)", []).append(time.perf_counter() - start)
+        else:
+            rec.errors["payroll job (end to end)"] = rec.errors.get("payroll job (end to end)", 0) + 1
+
+
+async def run_scenario(name, base_url, users, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        rec = Recorder()
+        await globals()[name](client, rec, users, args)
+        return rec.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run load-test scenarios against the attendance API")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--url", default=None, help="use a running server instead of starting gunicorn")
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8798)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per login/history scenario")
+    parser.add_argument("--payroll-runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--out", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    conn = get_connection()
+    users = bench_users(conn.cursor())
+    conn.close()
+    if not users:
+        sys.exit("No bench users found; run bench/seed.py first")
+
+    proc = None
+    base_url = args.url
+    if base_url is None:
+        proc, base_url = start_server(args.server, args.workers, args.port)
+
+    results = {"revision": git_revision(), "config": vars(args), "bench_users": len(users), "scenarios": {}}
+    try:
+        for name in scenarios:
+            results["scenarios"][name] = asyncio.run(run_scenario(name, base_url, users, args))
+    finally:
+        if proc is not None:
+            stop_server(proc)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
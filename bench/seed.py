@@ -0,0 +1,122 @@
+# seed.py
+#
+# Synthetic data for the benchmarks:
+#
+#   python bench/seed.py --staff 500 --months 3
+#
+# Applies migrations, then creates --staff users (bench<n>@bench.local, all with
+# password BENCH_PASSWORD) and weekday attendance for the last --months full
+# months up to yesterday. Today is left empty so the check-in burst has
+# something to do. Re-running tops up missing rows; --reset wipes bench data first.
+
+import argparse
+import time
+
+import bcrypt
+
+from common import ROOT  # noqa: F401  (puts the repo root on sys.path)
+from db import get_connection
+from models import attendance_summary
+from utils import migrate
+
+BENCH_DOMAIN = "bench.local"
+BENCH_PASSWORD = "bench-password"
+BATCHES = ["A", "B", "C"]
+
+BENCH_USERS_SQL = f"SELECT id FROM users WHERE email LIKE '%%@{BENCH_DOMAIN}'"
+
+INSERT_USERS_SQL = """
+    INSERT INTO users (name, email, phone, age, batch, salary, salary_per_month, password, role)
+    SELECT 'Bench Staff ' || n,
+           'bench' || n || '@' || %(domain)s,
+           '9' || lpad(n::text, 9, '0'),
+           22 + n %% 30,
+           (%(batches)s::text[])[1 + n %% array_length(%(batches)s::text[], 1)],
+           20000 + (n %% 9) * 5000,
+           20000 + (n %% 9) * 5000,
+           %(password)s,
+           'user'
+    FROM generate_series(1, %(staff)s) AS n
+    ON CONFLICT (email) DO NOTHING
+"""
+
+# Check-in spread 09:00-10:00, check-out 17:00-19:00, ~5% absences, ~1% paid leave.
+# Late/early follow the default shift policy (09:30-18:00, 10 minutes grace each way).
+# Absences are hashed from (user, day) so re-running does not fill them in.
+# Both attendance column sets are filled so every read path has data.
+INSERT_ATTENDANCE_SQL = f"""
+    INSERT INTO attendance (
+        user_id, date, checkin_time, checkout_time, is_late, is_early_leave,
+        check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave
+    )
+    SELECT user_id, day, cin, cout, cin > '09:40', cout < '17:50',
+           cin, cout,
+           GREATEST(0, floor(EXTRACT(EPOCH FROM cin - '09:40'::time) / 60))::int,
+           GREATEST(0, floor(EXTRACT(EPOCH FROM '17:50'::time - cout) / 60))::int,
+           TRUE, random() < 0.01
+    FROM (
+        SELECT u.id AS user_id, d::date AS day,
+               '09:00'::time + random() * interval '60 minutes' AS cin,
+               '17:00'::time + random() * interval '120 minutes' AS cout
+        FROM ({BENCH_USERS_SQL}) u
+        CROSS JOIN generate_series(
+            date_trunc('month', CURRENT_DATE) - make_interval(months => %(months)s),
+            CURRENT_DATE - 1,
+            interval '1 day'
+        ) AS d
+        WHERE EXTRACT(ISODOW FROM d) < 6 AND abs(hashtext(u.id || ':' || d::date)) %% 100 >= 5
+    ) s
+    ON CONFLICT (user_id, date) DO NOTHING
+"""
+
+RESET_SQL = [
+    f"DELETE FROM attendance WHERE user_id IN ({BENCH_USERS_SQL})",
+    f"DELETE FROM attendance_monthly WHERE user_id IN ({BENCH_USERS_SQL})",
+    f"DELETE FROM salary_logs WHERE user_id IN ({BENCH_USERS_SQL})",
+    f"DELETE FROM salary WHERE user_id IN ({BENCH_USERS_SQL})",
+    f"DELETE FROM salary_report_monthly WHERE user_id IN ({BENCH_USERS_SQL})",
+    f"DELETE FROM resource_versions WHERE user_id IN ({BENCH_USERS_SQL})",
+    f"DELETE FROM users WHERE id IN ({BENCH_USERS_SQL})",
+]
+
+
+def bench_users(cursor):
+    cursor.execute(f"SELECT id, email FROM users WHERE email LIKE '%%@{BENCH_DOMAIN}' ORDER BY id")
+    return cursor.fetchall()
+
+
+def seed(staff, months, reset=False):
+    migrate.upgrade()
+    password = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt()).decode()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    if reset:
+        for sql in RESET_SQL:
+            cursor.execute(sql)
+    cursor.execute(INSERT_USERS_SQL, {"domain": BENCH_DOMAIN, "batches": BATCHES,
+                                      "password": password, "staff": staff})
+    users = cursor.rowcount
+    cursor.execute(INSERT_ATTENDANCE_SQL, {"months": months})
+    days = cursor.rowcount
+    conn.commit()
+    conn.close()
+
+    attendance_summary.rebuild()
+    return users, days
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic staff and attendance")
+    parser.add_argument("--staff", type=int, default=500)
+    parser.add_argument("--months", type=int, default=3, help="full months of history before the current one")
+    parser.add_argument("--reset", action="store_true", help="delete existing bench users and their data first")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    users, days = seed(args.staff, args.months, args.reset)
+    print(f"Seeded {users} users, {days} attendance rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
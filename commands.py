@@ -0,0 +1,163 @@
+import click
+import time
+from models import attendance_summary, salary_report, salary_model
+from utils import attendance_import, attendance_partitions, migrate, payroll_jobs, shift_policy
+
+
+def init_app(app):
+    @app.cli.command("rebuild-attendance-summary")
+    @click.option("--year", type=int, default=None, help="Only rebuild this year")
+    @click.option("--month", type=int, default=None, help="Only rebuild this month (needs --year)")
+    def rebuild_attendance_summary(year, month):
+        """Recompute attendance_monthly from raw attendance rows."""
+        if month is not None and year is None:
+            raise click.UsageError("--month needs --year")
+        rows = attendance_summary.rebuild(year, month)
+        click.echo(f"Rebuilt {rows} summary rows")
+
+    @app.cli.command("db-upgrade")
+    @click.option("--to", "target", default=None, help="Stop after this version (e.g. 0002)")
+    def db_upgrade(target):
+        """Apply pending schema migrations."""
+        done = migrate.upgrade(target)
+        for step in done:
+            click.echo(f"Applied {step}")
+        click.echo("Schema up to date" if not done else f"{len(done)} migration(s) applied")
+
+    @app.cli.command("db-rollback")
+    @click.option("--steps", type=int, default=1, help="How many migrations to undo")
+    def db_rollback(steps):
+        """Undo the most recently applied schema migrations."""
+        try:
+            done = migrate.rollback(steps)
+        except migrate.IrreversibleMigration as e:
+            raise click.ClickException(str(e))
+        for step in done:
+            click.echo(f"Rolled back {step}")
+        if not done:
+            click.echo("Nothing to roll back")
+
+    @app.cli.command("db-status")
+    def db_status():
+        """List migrations and whether each one is applied."""
+        for version, name, applied_at in migrate.status():
+            state = f"applied {applied_at:%Y-%m-%d %H:%M}" if applied_at else "pending"
+            click.echo(f"{version}_{name:<30} {state}")
+
+    @app.cli.command("db-verify-indexes")
+    def db_verify_indexes():
+        """EXPLAIN the hot-path queries and fail if any cannot use an index."""
+        failed = 0
+        for name, ok, nodes in migrate.verify_indexes():
+            plan = ", ".join(f"{node} on {rel}" for node, rel in nodes)
+            click.echo(f"{'ok  ' if ok else 'FAIL'} {name:<20} {plan}")
+            failed += not ok
+        if failed:
+            raise click.ClickException(f"{failed} hot query(s) not covered by an index")
+
+    @app.cli.command("refresh-salary-report")
+    @click.option("--year", type=int, required=True)
+    @click.option("--month", type=int, required=True)
+    def refresh_salary_report(year, month):
+        """Rebuild the materialized salary report for one month from salary_logs."""
+        salary_report.refresh_month(year, month)
+        click.echo(f"Refreshed salary report for {year}-{month:02d}")
+
+    @app.cli.command("run-payroll")
+    @click.option("--year", type=int, required=True)
+    @click.option("--month", type=int, required=True)
+    def run_payroll(year, month):
+        """Run month-end payroll as a partitioned job and wait for it."""
+        try:
+            job_id = payroll_jobs.start_job(month, year)
+        except payroll_jobs.JobConflict as e:
+            raise click.ClickException(f"Payroll for {year}-{month:02d} is already running (job {e.args[0]})")
+        _wait_for_job(job_id)
+
+    @app.cli.command("resume-payroll-job")
+    @click.argument("job_id", type=int)
+    def resume_payroll_job(job_id):
+        """Re-run the unfinished partitions of a failed or stalled payroll job."""
+        try:
+            payroll_jobs.resume_job(job_id)
+        except payroll_jobs.JobConflict:
+            raise click.ClickException(f"Job {job_id} is still running or already finished")
+        _wait_for_job(job_id)
+
+
+    @app.cli.command("recalculate-dirty-salaries")
+    @click.option("--year", type=int, default=None, help="Only this year")
+    @click.option("--month", type=int, default=None, help="Only this month (needs --year)")
+    def recalculate_dirty_salaries(year, month):
+        """Recompute the salary table for users whose attendance changed since their last run."""
+        if month is not None and year is None:
+            raise click.UsageError("--month needs --year")
+        result = salary_model.calculate_salary_dirty(year, month)
+        click.echo(f"Recomputed {result['rows']} salary rows for {', '.join(result['months']) or 'no months'} "
+                   f"in {result['elapsed_ms']}ms")
+
+    @app.cli.command("reevaluate-attendance")
+    @click.option("--year", type=int, required=True)
+    @click.option("--month", type=int, required=True)
+    def reevaluate_attendance(year, month):
+        """Recompute late/early minutes and flags for a month under the current shift policies."""
+        result = shift_policy.reevaluate_month(year, month)
+        click.echo(f"Re-evaluated {result['rows']} attendance rows: {result['changed']} changed "
+                   f"for {result['users']} users")
+
+    @app.cli.command("import-attendance")
+    @click.argument("csv_file", type=click.File("rb"))
+    @click.option("--no-header", is_flag=True, help="The file has no header line")
+    def import_attendance(csv_file, no_header):
+        """Bulk-load attendance from a user_id,date,check_in,check_out CSV file."""
+        try:
+            result = attendance_import.import_csv(csv_file, header=not no_header)
+        except (ValueError, attendance_import.ImportUnsupported) as e:
+            raise click.ClickException(str(e))
+        click.echo(f"{result['rows']} rows: {result['inserted']} inserted, {result['updated']} updated, "
+                   f"{result['unchanged']} unchanged, {result['duplicates']} duplicates merged, "
+                   f"{result['rejected']} rejected in {result['elapsed_ms']}ms")
+        for reason, count in result["rejected_by_reason"].items():
+            click.echo(f"  {count} {reason}")
+        for error in result["errors"]:
+            click.echo(f"  row {error['row']}: {error['error']}")
+
+    @app.cli.command("attendance-partitions")
+    def attendance_partitions_list():
+        """List the monthly attendance partitions with approximate size."""
+        for part in attendance_partitions.list_partitions():
+            click.echo(f"{part['name']:<22} {part['approx_rows']:>10} rows {part['bytes'] / 2 ** 20:>8.1f} MB  "
+                       f"{part['bound']}")
+
+    @app.cli.command("ensure-attendance-partitions")
+    @click.option("--ahead", type=int, default=None, help="Months to create past the current one")
+    def ensure_attendance_partitions(ahead):
+        """Create upcoming monthly attendance partitions and split rows out of the default one."""
+        created = attendance_partitions.ensure_partitions(ahead)
+        for name in created:
+            click.echo(f"Created {name}")
+        click.echo(f"{len(created)} partition(s) created" if created else "Partitions up to date")
+
+    @app.cli.command("archive-attendance-year")
+    @click.argument("year", type=int)
+    def archive_attendance_year(year):
+        """Detach a closed year's attendance partitions into the archive schema."""
+        try:
+            archived = attendance_partitions.archive_year(year)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        for name in archived:
+            click.echo(f"Archived {name} to {attendance_partitions.ARCHIVE_SCHEMA}.{name}")
+        if not archived:
+            click.echo(f"No partitions for {year}")
+
+def _wait_for_job(job_id):
+    while True:
+        job = payroll_jobs.get_job(job_id)
+        click.echo(f"job {job_id}: {job['status']} {job['partitions_done']}/{job['partitions']} partitions, "
+                   f"{job['users_done']}/{job['users_total']} users, {job['users_per_sec']} users/s")
+        if job["status"] not in ("pending", "running"):
+            break
+        time.sleep(1)
+    if job["status"] != "done":
+        raise click.ClickException(job["error"] or "Payroll job failed")
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from db import get_connection
-import bcrypt
+from utils.passwords import check_password
 import psycopg2.extras
 
 auth_bp = Blueprint('auth', __name__)
@@ -18,7 +18,7 @@ def login():
     user = cursor.fetchone()
     conn.close()
 
-    if user and bcrypt.checkpw(password.encode(), user["password"].encode()):
+    if user and check_password(password, user["password"]):
         return jsonify({
             "success": True,
             "user": {
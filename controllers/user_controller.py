@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify
 from db import get_connection
-from datetime import datetime, date, time
+from datetime import datetime, date
 import psycopg2.extras
-import bcrypt
+from utils.passwords import check_password
+from models.attendance_model import (
+    calculate_early_minutes, calculate_late_minutes, get_attendance_log, insert_check_in, update_check_out
+)
+from utils.pagination import history_args, CURSOR_HEADER
+from utils.cache import cache
+from models.versions import conditional_response
 
 user_bp = Blueprint("user", __name__)
 
@@ -21,7 +27,7 @@ def login():
     user = cursor.fetchone()
     conn.close()
 
-    if user and bcrypt.checkpw(password.encode(), user["password"].encode()):
+    if user and check_password(password, user["password"]):
         return jsonify({
             "success": True,
             "user": {
@@ -39,15 +45,19 @@ def login():
 # -----------------------
 @user_bp.route("/profile/<int:user_id>", methods=["GET"])
 def get_profile(user_id):
+    user = cache.get_or_load(f"user:profile:{user_id}", lambda: _load_profile(user_id))
+    if user:
+        return jsonify(user)
+    return jsonify({"error": "User not found"}), 404
+
+
+def _load_profile(user_id):
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     cursor.execute("SELECT id, name, email, phone, age, batch, role FROM users WHERE id = %s", (user_id,))
     user = cursor.fetchone()
     conn.close()
-
-    if user:
-        return jsonify(user)
-    return jsonify({"error": "User not found"}), 404
+    return dict(user) if user else None
 
 
 # -----------------------
@@ -55,18 +65,20 @@ def get_profile(user_id):
 # -----------------------
 @user_bp.route("/attendance/<int:user_id>", methods=["GET"])
 def get_attendance(user_id):
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("""
-        SELECT date, check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave
-        FROM attendance
-        WHERE user_id = %s
-        ORDER BY date DESC
-    """, (user_id,))
-    logs = cursor.fetchall()
-    conn.close()
+    return conditional_response("attendance_version", user_id, lambda: _attendance_page(user_id))
 
-    return jsonify(logs)
+
+def _attendance_page(user_id):
+    try:
+        args = history_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    logs, next_cursor = get_attendance_log(user_id, **args)
+    response = jsonify(logs)
+    if next_cursor:
+        response.headers[CURSOR_HEADER] = next_cursor
+    return response
 
 
 # -----------------------
@@ -74,6 +86,10 @@ def get_attendance(user_id):
 # -----------------------
 @user_bp.route("/salary/<int:user_id>", methods=["GET"])
 def get_salary(user_id):
+    return conditional_response("salary_version", user_id, lambda: _latest_salary(user_id))
+
+
+def _latest_salary(user_id):
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     cursor.execute("""
@@ -101,25 +117,18 @@ def check_in():
     today = now.date()
     check_in_time = now.time()
 
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("SELECT * FROM attendance WHERE user_id = %s AND date = %s", (user_id, today))
-    if cursor.fetchone():
-        conn.close()
-        return jsonify({"message": "Already checked in"}), 400
-
-    late_limit = time(9, 40)
-    late_minutes = 0
-    if check_in_time > late_limit:
-        late_minutes = (datetime.combine(today, check_in_time) - datetime.combine(today, late_limit)).seconds // 60
-
-    cursor.execute("""
-        INSERT INTO attendance (user_id, date, check_in, late_minutes, is_present)
-        VALUES (%s, %s, %s, %s, %s)
-    """, (user_id, today, check_in_time, late_minutes, True))
+    late_minutes = calculate_late_minutes(user_id, check_in_time)
 
+    conn = get_connection()
+    cursor = conn.cursor()
+    inserted = insert_check_in(cursor, user_id, today, {
+        "check_in": check_in_time, "late_minutes": late_minutes, "is_present": True
+    })
     conn.commit()
     conn.close()
+
+    if not inserted:
+        return jsonify({"message": "Already checked in"}), 400
     return jsonify({"message": "Checked in", "late_minutes": late_minutes})
 
 
@@ -134,28 +143,18 @@ def check_out():
     today = now.date()
     check_out_time = now.time()
 
+    early_minutes = calculate_early_minutes(user_id, check_out_time)
+
     conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("SELECT * FROM attendance WHERE user_id = %s AND date = %s", (user_id, today))
-    record = cursor.fetchone()
+    cursor = conn.cursor()
+    status = update_check_out(cursor, user_id, today, {
+        "check_out": check_out_time, "early_minutes": early_minutes
+    }, "check_out")
+    conn.commit()
+    conn.close()
 
-    if not record:
-        conn.close()
+    if status == "missing":
         return jsonify({"message": "Check-in first"}), 400
-    if record["check_out"]:
-        conn.close()
+    if status == "done":
         return jsonify({"message": "Already checked out"}), 400
-
-    early_limit = time(17, 50)
-    early_minutes = 0
-    if check_out_time < early_limit:
-        early_minutes = (datetime.combine(today, early_limit) - datetime.combine(today, check_out_time)).seconds // 60
-
-    cursor.execute("""
-        UPDATE attendance SET check_out = %s, early_minutes = %s
-        WHERE user_id = %s AND date = %s
-    """, (check_out_time, early_minutes, user_id, today))
-
-    conn.commit()
-    conn.close()
     return jsonify({"message": "Checked out", "early_minutes": early_minutes})
@@ -1,11 +1,441 @@
 import psycopg2
+import psycopg2.extensions
+import logging
 import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
 from dotenv import load_dotenv
+from flask import g, has_app_context, has_request_context
 
 load_dotenv()
 
+# Pool sizing (per gunicorn worker)
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Idle connections older than this are pinged with SELECT 1 before being handed out
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+
+# Statements slower than this are written to SLOW_QUERY_LOG with their call site (-1 disables)
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+SLOW_QUERY_LOG = os.getenv("DB_SLOW_QUERY_LOG", "slow_queries.log")
+# Fraction of slow SELECTs re-run under EXPLAIN (ANALYZE, BUFFERS) and logged with their plan
+SLOW_QUERY_EXPLAIN = float(os.getenv("DB_SLOW_QUERY_EXPLAIN", "0"))
+# Slow queries are logged as their template plus shortened parameters, never with
+# values filled in: statement text is cut at this many characters
+SLOW_QUERY_MAX_CHARS = int(os.getenv("DB_SLOW_QUERY_MAX_CHARS", "1000"))
+SLOW_QUERY_MAX_PARAMS = 10
+SLOW_QUERY_PARAM_CHARS = 40
+
+# String literals inlined by the caller (execute_values builds its VALUES this way)
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Connection whose close() hands it back to the pool instead of closing the socket
+class PooledConnection(psycopg2.extensions.connection):
+    _pool = None
+    _borrowed = False
+    # Changes on every acquire(), so a stale holder can tell its borrow has ended
+    _borrow_id = 0
+    _idle_since = 0.0
+
+    def close(self):
+        if self._pool is not None:
+            # Closing twice (handler + request teardown) is a no-op
+            if self._borrowed:
+                self._pool.release(self)
+        elif not self.closed:
+            super().close()
+
+    def discard(self):
+        self._pool = None
+        if not self.closed:
+            super().close()
+
+    # Every cursor is instrumented, whatever cursor_factory the caller asks for
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _instrumented(factory)
+        return super().cursor(*args, **kwargs)
+
+
+# Counts queries, DB time and rows fetched into the current request's stats,
+# and logs statements slower than SLOW_QUERY_MS
+class InstrumentedCursor:
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception as e:
+            self._timed(query, vars, start, e)
+            raise
+        self._timed(query, vars, start)
+        return result
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            result = super().executemany(query, vars_list)
+        except Exception as e:
+            self._timed(query, None, start, e)
+            raise
+        self._timed(query, None, start)
+        return result
+
+    def _timed(self, query, vars, start, error=None):
+        elapsed = time.perf_counter() - start
+        _record(queries=1, db_time=elapsed)
+        if 0 <= SLOW_QUERY_MS <= elapsed * 1000:
+            _log_slow(self, query, vars, elapsed, error)
+
+    # Named (server-side) cursors do their real DB work in fetch*, so time those too
+    def _fetch(self, fetch, *args):
+        start = time.perf_counter()
+        rows = fetch(*args)
+        _record(rows=len(rows) if isinstance(rows, list) else int(rows is not None),
+                db_time=time.perf_counter() - start if self.name else 0.0)
+        return rows
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+_instrumented_classes = {}
+
+
+def _instrumented(factory):
+    if issubclass(factory, InstrumentedCursor):
+        return factory
+    cls = _instrumented_classes.get(factory)
+    if cls is None:
+        cls = type("Instrumented" + factory.__name__, (InstrumentedCursor, factory), {})
+        _instrumented_classes[factory] = cls
+    return cls
+
+
+class ConnectionPool:
+    def __init__(self, maxconn, timeout):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._idle = []
+        self._open = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "acquired": 0,
+            "timeouts": 0,
+            "discarded": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+    def _connect(self):
+        conn = psycopg2.connect(host=os.getenv("DB_HOST"), connection_factory=PooledConnection)
+        conn._pool = self
+        return conn
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - conn._idle_since < POOL_PING_AFTER:
+            return True
+        try:
+            cur = psycopg2.extensions.cursor(conn)
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _borrow(self, start):
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    self._in_use += 1
+                    return self._idle.pop(), False
+                if self._open < self.maxconn:
+                    self._open += 1
+                    self._in_use += 1
+                    return None, True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout("No database connection available within %.1fs" % self.timeout)
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+    def _forget(self, conn):
+        with self._cond:
+            self._open -= 1
+            self._in_use -= 1
+            if conn is not None:
+                self._stats["discarded"] += 1
+            self._cond.notify()
+        if conn is not None:
+            conn.discard()
+
+    def acquire(self):
+        start = time.monotonic()
+        while True:
+            conn, new = self._borrow(start)
+            if new:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._forget(None)
+                    raise
+                break
+            # Health check happens outside the lock so a slow ping doesn't stall other borrowers
+            if self._healthy(conn):
+                break
+            self._forget(conn)
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats["acquired"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            conn._borrow_id = self._stats["acquired"]
+        conn._borrowed = True
+        return conn
+
+    def release(self, conn):
+        if not conn._borrowed:
+            return
+        conn._borrowed = False
+        # Never hand out a connection with an open transaction
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                conn.discard()
+        with self._cond:
+            self._in_use -= 1
+            if conn.closed:
+                self._open -= 1
+                self._stats["discarded"] += 1
+                conn.discard()
+            else:
+                conn._idle_since = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            acquired = self._stats["acquired"]
+            return {
+                "pid": os.getpid(),
+                "max_size": self.maxconn,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                "acquired": acquired,
+                "timeouts": self._stats["timeouts"],
+                "discarded": self._stats["discarded"],
+                "wait_time_avg_ms": round(self._stats["wait_time_total"] / acquired * 1000, 3) if acquired else 0.0,
+                "wait_time_max_ms": round(self._stats["wait_time_max"] * 1000, 3),
+            }
+
+
+_slow_logger = None
+_slow_logger_lock = threading.Lock()
+
+# Frames in these files are skipped when looking for the code that issued a query
+_INTERNAL_FILES = (os.path.abspath(__file__), os.path.dirname(os.path.abspath(psycopg2.__file__)))
+
+
+def _call_site():
+    frame = sys._getframe(1)
+    while frame is not None and os.path.abspath(frame.f_code.co_filename).startswith(_INTERNAL_FILES):
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{os.path.relpath(frame.f_code.co_filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+# Falls back to stderr if SLOW_QUERY_LOG can't be opened: logging must never fail the query
+def _get_slow_logger():
+    global _slow_logger
+    with _slow_logger_lock:
+        if _slow_logger is None:
+            try:
+                handler = logging.FileHandler(SLOW_QUERY_LOG)
+            except OSError as e:
+                handler = logging.StreamHandler(sys.stderr)
+                print(f"Slow query log {SLOW_QUERY_LOG} not writable ({e}), logging to stderr", file=sys.stderr)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("db.slow_queries")
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            _slow_logger = logger
+    return _slow_logger
+
+
+# Only plain SELECTs are explained: EXPLAIN ANALYZE runs the statement again, and
+# the savepoint can undo writes but not session advisory locks
+def _should_explain(cursor, statement):
+    if SLOW_QUERY_EXPLAIN <= 0 or cursor.name or cursor.connection.autocommit:
+        return False
+    if not statement.lstrip().upper().startswith("SELECT") or "pg_advisory" in statement:
+        return False
+    return random.random() < SLOW_QUERY_EXPLAIN
+
+
+def _explain(conn, statement):
+    cur = psycopg2.extensions.cursor(conn)
+    try:
+        cur.execute("SAVEPOINT slow_query_explain")
+        try:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement)
+            return [row[0] for row in cur.fetchall()]
+        except psycopg2.Error as e:
+            return [f"EXPLAIN failed: {e}".strip()]
+        finally:
+            cur.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+    finally:
+        cur.close()
+
+
+def _shorten(text, limit):
+    return text if len(text) <= limit else f"{text[:limit]}... ({len(text)} chars)"
+
+
+# Statement template and shortened parameters, for the log
+def _describe(cursor, query, vars):
+    if isinstance(query, bytes):
+        text = query.decode(errors="replace")
+    elif hasattr(query, "as_string"):
+        text = query.as_string(cursor)
+    else:
+        text = str(query)
+    text = " ".join(text.split())
+    if vars is None:
+        text = _STRING_LITERAL_RE.sub("'?'", text)
+    lines = ["    " + _shorten(text, SLOW_QUERY_MAX_CHARS)]
+    if vars:
+        items = list(vars.items()) if isinstance(vars, dict) else list(enumerate(vars, 1))
+        params = [f"{key}={_shorten(repr(value), SLOW_QUERY_PARAM_CHARS)}"
+                  for key, value in items[:SLOW_QUERY_MAX_PARAMS]]
+        if len(items) > SLOW_QUERY_MAX_PARAMS:
+            params.append(f"... ({len(items)} params)")
+        lines.append("    params: " + ", ".join(params))
+    return lines
+
+
+def _log_slow(cursor, query, vars, elapsed, error=None):
+    header = f"{datetime.now().isoformat(timespec='seconds')} pid={os.getpid()} {elapsed * 1000:.1f}ms"
+    if error is None:
+        header += f" rows={cursor.rowcount}"
+    else:
+        header += f" error={type(error).__name__}"
+    lines = [f"{header} at {_call_site()}", *_describe(cursor, query, vars)]
+    if error is None and SLOW_QUERY_EXPLAIN > 0:
+        try:
+            statement = cursor.mogrify(query, vars).decode(errors="replace")
+        except Exception:
+            statement = ""
+        # The filled-in statement is only re-run, never logged
+        if statement and _should_explain(cursor, statement):
+            lines += ["    | " + line for line in _explain(cursor.connection, statement)]
+    _get_slow_logger().info("\n".join(lines))
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+# One pool per process: gunicorn workers must not share sockets inherited from the master
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(POOL_MAX, POOL_TIMEOUT)
+                _pool_pid = pid
+    return _pool
+
+
+# Close this process's idle connections and forget the pool (the gunicorn master
+# after start-up work, so workers don't inherit its sockets)
+def close_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is None:
+        return
+    with pool._cond:
+        idle, pool._idle = pool._idle, []
+        pool._open -= len(idle)
+    for conn in idle:
+        conn.discard()
+
+
 def get_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST")
-    )
+    start = time.perf_counter()
+    conn = get_pool().acquire()
+    _record(acquires=1, acquire_time=time.perf_counter() - start)
+    _track(conn)
+    return conn
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+# Remember connections borrowed during a request so teardown can return any that leaked.
+# The borrow id is kept too: a connection the handler already closed may have been
+# borrowed again by another thread by the time teardown runs.
+def _track(conn):
+    if has_app_context():
+        g.setdefault("_db_connections", []).append((conn, conn._borrow_id))
+
+
+# Per-request DB counters, read by utils/metrics.py at the end of the request
+def request_db_stats():
+    stats = g.get("_db_stats")
+    if stats is None:
+        stats = g._db_stats = {"queries": 0, "db_time": 0.0, "rows": 0, "acquires": 0, "acquire_time": 0.0}
+    return stats
+
+
+def _record(**values):
+    if not has_request_context():
+        return
+    stats = request_db_stats()
+    for key, value in values.items():
+        stats[key] += value
+
+
+def _release_request_connections(exc=None):
+    for conn, borrow_id in g.pop("_db_connections", []):
+        if conn._borrowed and conn._borrow_id == borrow_id:
+            conn.close()
+
 
+def init_app(app):
+    app.teardown_appcontext(_release_request_connections)
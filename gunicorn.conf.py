@@ -0,0 +1,66 @@
+# gunicorn.conf.py
+#
+# Picked up automatically by `gunicorn app:app`. Sets up prometheus_client's
+# multiprocess mode so /metrics reports totals across all workers: each worker
+# writes its samples to PROMETHEUS_MULTIPROC_DIR, which is wiped on start-up
+# and cleaned up for workers that exit. Pending schema migrations are applied
+# by the master before any worker starts when MIGRATE_ON_START=1 (otherwise run
+# `flask db-upgrade` as a deploy step); a failed migration is logged and the
+# server starts on the schema it has. Each worker makes sure the coming months'
+# attendance partitions exist before it takes requests.
+
+import os
+import shutil
+import tempfile
+
+# Must be set before prometheus_client is imported anywhere in the master,
+# otherwise forked workers inherit the single-process value store
+METRICS_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                                    os.path.join(tempfile.gettempdir(), "attendance-metrics"))
+
+# Threaded workers: a request waiting on bcrypt (utils/passwords.py) or on a
+# group commit (utils/group_commit.py) only holds its own thread
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+MIGRATE_ON_START = os.getenv("MIGRATE_ON_START", "0") == "1"
+
+
+def on_starting(server):
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR)
+    if MIGRATE_ON_START:
+        _migrate(server)
+
+
+# A fresh database would otherwise be served without the tables the write paths
+# rely on (attendance_monthly, resource_versions, ...)
+def _migrate(server):
+    import db
+    from utils import migrate
+    try:
+        for step in migrate.upgrade():
+            server.log.info("Applied migration %s", step)
+    except Exception:
+        # Each migration runs in its own transaction, so the failed one left nothing behind
+        server.log.exception("Migration failed; starting on the current schema")
+    finally:
+        db.close_pool()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    from utils import attendance_partitions
+    try:
+        created = attendance_partitions.ensure_partitions()
+    except Exception as e:
+        # Rows still land in attendance_default; cron or the next start-up retries
+        worker.log.warning("Could not create attendance partitions: %s", e)
+        return
+    if created:
+        worker.log.info("Created attendance partitions: %s", ", ".join(created))
@@ -0,0 +1,8 @@
+-- 0001 adopts tables that usually existed before migrations did, so rolling it
+-- back would drop production data. Refused; drop the tables by hand if that is
+-- really what you want (utils/migrate.py stops before reaching this step).
+DO $$
+BEGIN
+    RAISE EXCEPTION '0001_core_tables cannot be rolled back: it owns the core data tables';
+END
+$$;
@@ -0,0 +1,106 @@
+-- Core tables. IF NOT EXISTS so databases created by hand before migrations
+-- existed can be brought under version control without losing data; the
+-- ADD COLUMN IF NOT EXISTS blocks give such tables every column the code uses.
+-- attendance / users carry both column sets in use: app.py writes
+-- checkin_time / is_late / salary, the blueprints write check_in / late_minutes /
+-- salary_per_month.
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    email TEXT NOT NULL,
+    phone TEXT,
+    age INTEGER,
+    batch TEXT,
+    salary NUMERIC(12, 2),
+    salary_per_month NUMERIC(12, 2),
+    password TEXT,
+    role TEXT NOT NULL DEFAULT 'user'
+);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    date DATE NOT NULL,
+    checkin_time TIME,
+    checkout_time TIME,
+    is_late BOOLEAN DEFAULT FALSE,
+    is_early_leave BOOLEAN DEFAULT FALSE,
+    check_in TIME,
+    check_out TIME,
+    late_minutes INTEGER DEFAULT 0,
+    early_minutes INTEGER DEFAULT 0,
+    is_present BOOLEAN DEFAULT TRUE,
+    is_paid_leave BOOLEAN DEFAULT FALSE,
+    permission_used BOOLEAN DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS salary_logs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    base_salary NUMERIC(12, 2),
+    late_deductions NUMERIC(12, 2),
+    early_deductions NUMERIC(12, 2),
+    final_salary NUMERIC(12, 2)
+);
+
+CREATE TABLE IF NOT EXISTS salary (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    total_days INTEGER,
+    total_present INTEGER,
+    paid_leave INTEGER,
+    permissions_used INTEGER,
+    late_deductions NUMERIC(12, 2),
+    early_deductions NUMERIC(12, 2),
+    total_deductions NUMERIC(12, 2),
+    total_additions NUMERIC(12, 2),
+    final_salary NUMERIC(12, 2)
+);
+
+-- Columns a hand-made table may be missing. NOT NULL is left to the CREATE
+-- above: it can't be added to a column of an existing table with rows.
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS name TEXT,
+    ADD COLUMN IF NOT EXISTS email TEXT,
+    ADD COLUMN IF NOT EXISTS phone TEXT,
+    ADD COLUMN IF NOT EXISTS age INTEGER,
+    ADD COLUMN IF NOT EXISTS batch TEXT,
+    ADD COLUMN IF NOT EXISTS salary NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS salary_per_month NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS password TEXT,
+    ADD COLUMN IF NOT EXISTS role TEXT NOT NULL DEFAULT 'user';
+
+ALTER TABLE attendance
+    ADD COLUMN IF NOT EXISTS checkin_time TIME,
+    ADD COLUMN IF NOT EXISTS checkout_time TIME,
+    ADD COLUMN IF NOT EXISTS is_late BOOLEAN DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS is_early_leave BOOLEAN DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS check_in TIME,
+    ADD COLUMN IF NOT EXISTS check_out TIME,
+    ADD COLUMN IF NOT EXISTS late_minutes INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS early_minutes INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS is_present BOOLEAN DEFAULT TRUE,
+    ADD COLUMN IF NOT EXISTS is_paid_leave BOOLEAN DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS permission_used BOOLEAN DEFAULT FALSE;
+
+ALTER TABLE salary_logs
+    ADD COLUMN IF NOT EXISTS base_salary NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS late_deductions NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS early_deductions NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS final_salary NUMERIC(12, 2);
+
+ALTER TABLE salary
+    ADD COLUMN IF NOT EXISTS total_days INTEGER,
+    ADD COLUMN IF NOT EXISTS total_present INTEGER,
+    ADD COLUMN IF NOT EXISTS paid_leave INTEGER,
+    ADD COLUMN IF NOT EXISTS permissions_used INTEGER,
+    ADD COLUMN IF NOT EXISTS late_deductions NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS early_deductions NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS total_deductions NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS total_additions NUMERIC(12, 2),
+    ADD COLUMN IF NOT EXISTS final_salary NUMERIC(12, 2);
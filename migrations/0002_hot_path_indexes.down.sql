@@ -0,0 +1,6 @@
+DROP INDEX IF EXISTS salary_logs_period_idx;
+DROP INDEX IF EXISTS salary_user_period_key;
+DROP INDEX IF EXISTS salary_logs_user_period_key;
+DROP INDEX IF EXISTS users_role_idx;
+DROP INDEX IF EXISTS users_email_key;
+DROP INDEX IF EXISTS attendance_user_date_key;
@@ -0,0 +1,49 @@
+-- Unique keys the upserts rely on (ON CONFLICT needs a matching unique index)
+-- plus the indexes behind login, staff lists, history and reports.
+-- Duplicates left over from before the constraints existed are removed first:
+-- attendance keeps the earliest row (the first check-in of the day), payroll
+-- tables keep the latest recomputation.
+
+DELETE FROM attendance a USING attendance b
+WHERE a.user_id = b.user_id AND a.date = b.date AND a.id > b.id;
+
+DELETE FROM salary_logs a USING salary_logs b
+WHERE a.user_id = b.user_id AND a.year = b.year AND a.month = b.month AND a.id < b.id;
+
+DELETE FROM salary a USING salary b
+WHERE a.user_id = b.user_id AND a.year = b.year AND a.month = b.month AND a.id < b.id;
+
+-- Check-in/out, ON CONFLICT (user_id, date), history ORDER BY date DESC
+CREATE UNIQUE INDEX IF NOT EXISTS attendance_user_date_key ON attendance (user_id, date);
+
+-- Duplicate emails can't be merged automatically (each account has its own
+-- attendance and salary rows), so stop with the list and let an admin fix them
+DO $$
+DECLARE
+    dupes TEXT;
+BEGIN
+    SELECT string_agg(format('%s (ids %s)', email, ids), ', ' ORDER BY email) INTO dupes
+    FROM (
+        SELECT email, string_agg(id::text, ', ' ORDER BY id) AS ids
+        FROM users
+        GROUP BY email
+        HAVING COUNT(*) > 1
+    ) d;
+    IF dupes IS NOT NULL THEN
+        RAISE EXCEPTION 'users has duplicate emails, merge or rename them before migrating: %', dupes;
+    END IF;
+END $$;
+
+-- Login and add-staff lookups by email
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email);
+
+-- Staff lists (WHERE role = 'user' ORDER BY id)
+CREATE INDEX IF NOT EXISTS users_role_idx ON users (role, id);
+
+-- Upserts ON CONFLICT (user_id, month, year) and "latest salary" lookups
+-- (WHERE user_id = ? ORDER BY year DESC, month DESC)
+CREATE UNIQUE INDEX IF NOT EXISTS salary_logs_user_period_key ON salary_logs (user_id, year, month);
+CREATE UNIQUE INDEX IF NOT EXISTS salary_user_period_key ON salary (user_id, year, month);
+
+-- Salary report exports (WHERE year = ? [AND month = ?])
+CREATE INDEX IF NOT EXISTS salary_logs_period_idx ON salary_logs (year, month);
@@ -0,0 +1,4 @@
+DROP TABLE IF EXISTS salary_report_totals;
+DROP TABLE IF EXISTS salary_report_monthly;
+DROP TABLE IF EXISTS resource_versions;
+DROP TABLE IF EXISTS attendance_monthly;
@@ -0,0 +1,46 @@
+-- Derived / bookkeeping tables (previously created by `flask ensure-schema`).
+
+-- Per-user-per-month attendance counters (models/attendance_summary.py)
+CREATE TABLE IF NOT EXISTS attendance_monthly (
+    user_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    present_days INTEGER NOT NULL DEFAULT 0,
+    late_days INTEGER NOT NULL DEFAULT 0,
+    early_days INTEGER NOT NULL DEFAULT 0,
+    paid_leave_days INTEGER NOT NULL DEFAULT 0,
+    permission_days INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year, month)
+);
+
+-- ETag change counters (models/versions.py)
+CREATE TABLE IF NOT EXISTS resource_versions (
+    user_id INTEGER PRIMARY KEY,
+    attendance_version BIGINT NOT NULL DEFAULT 0,
+    salary_version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Materialized salary report (models/salary_report.py)
+CREATE TABLE IF NOT EXISTS salary_report_monthly (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    name TEXT,
+    batch TEXT,
+    base_salary DOUBLE PRECISION NOT NULL,
+    total_deductions DOUBLE PRECISION NOT NULL,
+    final_salary DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (year, month, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS salary_report_totals (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    batch TEXT NOT NULL,
+    employees INTEGER NOT NULL,
+    total_base DOUBLE PRECISION NOT NULL,
+    total_deductions DOUBLE PRECISION NOT NULL,
+    total_spent DOUBLE PRECISION NOT NULL,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (year, month, batch)
+);
@@ -0,0 +1,2 @@
+DROP TABLE IF EXISTS payroll_job_partitions;
+DROP TABLE IF EXISTS payroll_jobs;
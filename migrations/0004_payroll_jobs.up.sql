@@ -0,0 +1,35 @@
+-- Background payroll jobs (utils/payroll_jobs.py). A job covers one month and
+-- is split into user-id ranges; each partition commits on its own, so a job
+-- that dies half-way resumes with only the unfinished partitions.
+
+CREATE TABLE IF NOT EXISTS payroll_jobs (
+    id SERIAL PRIMARY KEY,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    partitions INTEGER NOT NULL DEFAULT 0,
+    users_total INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    started_at TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    finished_at TIMESTAMP
+);
+
+-- At most one unfinished job per month
+CREATE UNIQUE INDEX IF NOT EXISTS payroll_jobs_active_month_key
+    ON payroll_jobs (year, month) WHERE status IN ('pending', 'running');
+
+CREATE TABLE IF NOT EXISTS payroll_job_partitions (
+    job_id INTEGER NOT NULL REFERENCES payroll_jobs(id) ON DELETE CASCADE,
+    partition INTEGER NOT NULL,
+    first_user_id INTEGER NOT NULL,
+    last_user_id INTEGER NOT NULL,
+    users INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    PRIMARY KEY (job_id, partition)
+);
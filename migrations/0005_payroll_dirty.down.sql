@@ -0,0 +1,5 @@
+DROP TRIGGER IF EXISTS attendance_payroll_dirty_delete ON attendance;
+DROP TRIGGER IF EXISTS attendance_payroll_dirty_update ON attendance;
+DROP TRIGGER IF EXISTS attendance_payroll_dirty_insert ON attendance;
+DROP FUNCTION IF EXISTS mark_payroll_dirty();
+DROP TABLE IF EXISTS payroll_dirty;
@@ -0,0 +1,52 @@
+-- (user, month) pairs whose attendance changed since their salary row was last
+-- computed. Statement-level triggers with transition tables mark every path that
+-- writes attendance (check-in/out, edits, bulk imports) with one INSERT per
+-- statement. `version` increases on every re-mark so a recompute only clears
+-- the marks it actually read (models/salary_model.py).
+
+CREATE TABLE IF NOT EXISTS payroll_dirty (
+    user_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    version BIGINT NOT NULL DEFAULT 1,
+    marked_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (year, month, user_id)
+);
+
+CREATE OR REPLACE FUNCTION mark_payroll_dirty() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO payroll_dirty (user_id, year, month)
+        SELECT DISTINCT user_id, EXTRACT(YEAR FROM date)::int, EXTRACT(MONTH FROM date)::int FROM new_rows
+        ON CONFLICT (year, month, user_id) DO UPDATE
+            SET version = payroll_dirty.version + 1, marked_at = now();
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO payroll_dirty (user_id, year, month)
+        SELECT DISTINCT user_id, EXTRACT(YEAR FROM date)::int, EXTRACT(MONTH FROM date)::int FROM old_rows
+        ON CONFLICT (year, month, user_id) DO UPDATE
+            SET version = payroll_dirty.version + 1, marked_at = now();
+    ELSE
+        INSERT INTO payroll_dirty (user_id, year, month)
+        SELECT DISTINCT user_id, EXTRACT(YEAR FROM date)::int, EXTRACT(MONTH FROM date)::int
+        FROM (SELECT user_id, date FROM old_rows UNION SELECT user_id, date FROM new_rows) changed
+        ON CONFLICT (year, month, user_id) DO UPDATE
+            SET version = payroll_dirty.version + 1, marked_at = now();
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS attendance_payroll_dirty_insert ON attendance;
+CREATE TRIGGER attendance_payroll_dirty_insert
+    AFTER INSERT ON attendance REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
+
+DROP TRIGGER IF EXISTS attendance_payroll_dirty_update ON attendance;
+CREATE TRIGGER attendance_payroll_dirty_update
+    AFTER UPDATE ON attendance REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
+
+DROP TRIGGER IF EXISTS attendance_payroll_dirty_delete ON attendance;
+CREATE TRIGGER attendance_payroll_dirty_delete
+    AFTER DELETE ON attendance REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
@@ -0,0 +1 @@
+DROP TABLE IF EXISTS shift_policies;
@@ -0,0 +1,17 @@
+-- Work schedule per batch (utils/shift_policy.py). A check-in is late once it is
+-- past start_time + late_grace_minutes; a check-out is early before
+-- end_time - early_grace_minutes. Batch '*' applies to users whose batch has no
+-- row of its own.
+
+CREATE TABLE IF NOT EXISTS shift_policies (
+    batch TEXT PRIMARY KEY,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    late_grace_minutes INTEGER NOT NULL DEFAULT 10 CHECK (late_grace_minutes >= 0),
+    early_grace_minutes INTEGER NOT NULL DEFAULT 10 CHECK (early_grace_minutes >= 0),
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+INSERT INTO shift_policies (batch, start_time, end_time, late_grace_minutes, early_grace_minutes)
+VALUES ('*', '09:30', '18:00', 10, 10)
+ON CONFLICT (batch) DO NOTHING;
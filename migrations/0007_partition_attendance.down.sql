@@ -0,0 +1,50 @@
+-- Back to a single attendance table. Partitions archived with
+-- `flask archive-attendance-year` live in the archive schema and are not copied back.
+
+ALTER TABLE attendance RENAME TO attendance_partitioned;
+ALTER TABLE attendance_partitioned RENAME CONSTRAINT attendance_pkey TO attendance_partitioned_pkey;
+ALTER INDEX attendance_user_date_key RENAME TO attendance_partitioned_user_date_key;
+ALTER SEQUENCE attendance_id_seq OWNED BY NONE;
+
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY DEFAULT nextval('attendance_id_seq'),
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    date DATE NOT NULL,
+    checkin_time TIME,
+    checkout_time TIME,
+    is_late BOOLEAN DEFAULT FALSE,
+    is_early_leave BOOLEAN DEFAULT FALSE,
+    check_in TIME,
+    check_out TIME,
+    late_minutes INTEGER DEFAULT 0,
+    early_minutes INTEGER DEFAULT 0,
+    is_present BOOLEAN DEFAULT TRUE,
+    is_paid_leave BOOLEAN DEFAULT FALSE,
+    permission_used BOOLEAN DEFAULT FALSE
+);
+
+ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id;
+
+-- Columns by name: a table adopted by 0001 may have them in another order
+INSERT INTO attendance (
+    id, user_id, date, checkin_time, checkout_time, is_late, is_early_leave,
+    check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave, permission_used
+)
+SELECT id, user_id, date, checkin_time, checkout_time, is_late, is_early_leave,
+    check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave, permission_used
+FROM attendance_partitioned;
+DROP TABLE attendance_partitioned;
+
+CREATE UNIQUE INDEX attendance_user_date_key ON attendance (user_id, date);
+
+CREATE TRIGGER attendance_payroll_dirty_insert
+    AFTER INSERT ON attendance REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
+
+CREATE TRIGGER attendance_payroll_dirty_update
+    AFTER UPDATE ON attendance REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
+
+CREATE TRIGGER attendance_payroll_dirty_delete
+    AFTER DELETE ON attendance REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
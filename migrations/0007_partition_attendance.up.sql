@@ -0,0 +1,78 @@
+-- Monthly range partitioning of attendance on `date` (utils/attendance_partitions.py).
+-- Partitions are named attendance_YYYY_MM; rows outside every partition land in
+-- attendance_default until `flask ensure-attendance-partitions` splits them out.
+-- Existing rows are copied into the new table, so this step takes as long as a
+-- full rewrite of attendance.
+--
+-- The primary key has to include the partition key, so it becomes (id, date);
+-- ids still come from attendance_id_seq. The (user_id, date) unique key behind
+-- ON CONFLICT and the payroll dirty triggers from 0005 are recreated on the
+-- partitioned table.
+
+ALTER TABLE attendance RENAME TO attendance_unpartitioned;
+ALTER TABLE attendance_unpartitioned RENAME CONSTRAINT attendance_pkey TO attendance_unpartitioned_pkey;
+ALTER INDEX attendance_user_date_key RENAME TO attendance_unpartitioned_user_date_key;
+ALTER SEQUENCE attendance_id_seq OWNED BY NONE;
+
+CREATE TABLE attendance (
+    id INTEGER NOT NULL DEFAULT nextval('attendance_id_seq'),
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    date DATE NOT NULL,
+    checkin_time TIME,
+    checkout_time TIME,
+    is_late BOOLEAN DEFAULT FALSE,
+    is_early_leave BOOLEAN DEFAULT FALSE,
+    check_in TIME,
+    check_out TIME,
+    late_minutes INTEGER DEFAULT 0,
+    early_minutes INTEGER DEFAULT 0,
+    is_present BOOLEAN DEFAULT TRUE,
+    is_paid_leave BOOLEAN DEFAULT FALSE,
+    permission_used BOOLEAN DEFAULT FALSE
+) PARTITION BY RANGE (date);
+
+ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id;
+
+-- One partition per month from the oldest row through three months ahead
+DO $$
+DECLARE
+    first_month DATE;
+    month DATE;
+BEGIN
+    SELECT COALESCE(date_trunc('month', MIN(date)), date_trunc('month', CURRENT_DATE))::date
+    INTO first_month FROM attendance_unpartitioned;
+    month := first_month;
+    WHILE month <= (date_trunc('month', CURRENT_DATE) + interval '3 months')::date LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF attendance FOR VALUES FROM (%L) TO (%L)',
+                       'attendance_' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date);
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END
+$$;
+
+CREATE TABLE attendance_default PARTITION OF attendance DEFAULT;
+
+-- Columns by name: a table adopted by 0001 may have them in another order
+INSERT INTO attendance (
+    id, user_id, date, checkin_time, checkout_time, is_late, is_early_leave,
+    check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave, permission_used
+)
+SELECT id, user_id, date, checkin_time, checkout_time, is_late, is_early_leave,
+    check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave, permission_used
+FROM attendance_unpartitioned;
+DROP TABLE attendance_unpartitioned;
+
+ALTER TABLE attendance ADD CONSTRAINT attendance_pkey PRIMARY KEY (id, date);
+CREATE UNIQUE INDEX attendance_user_date_key ON attendance (user_id, date);
+
+CREATE TRIGGER attendance_payroll_dirty_insert
+    AFTER INSERT ON attendance REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
+
+CREATE TRIGGER attendance_payroll_dirty_update
+    AFTER UPDATE ON attendance REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
+
+CREATE TRIGGER attendance_payroll_dirty_delete
+    AFTER DELETE ON attendance REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_payroll_dirty();
@@ -0,0 +1,6 @@
+INSERT INTO salary_report_totals (year, month, batch, employees, total_base, total_deductions, total_spent, refreshed_at)
+SELECT year, month, '*', employees, total_base, total_deductions, total_spent, refreshed_at
+FROM salary_report_overall
+ON CONFLICT (year, month, batch) DO NOTHING;
+
+DROP TABLE IF EXISTS salary_report_overall;
@@ -0,0 +1,22 @@
+-- The all-batches total of the salary report used to be a salary_report_totals
+-- row with batch '*', which a real batch named '*' collided with. It now has a
+-- table of its own and salary_report_totals holds only per-batch rows.
+
+CREATE TABLE IF NOT EXISTS salary_report_overall (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    employees INTEGER NOT NULL,
+    total_base DOUBLE PRECISION NOT NULL,
+    total_deductions DOUBLE PRECISION NOT NULL,
+    total_spent DOUBLE PRECISION NOT NULL,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (year, month)
+);
+
+INSERT INTO salary_report_overall (year, month, employees, total_base, total_deductions, total_spent, refreshed_at)
+SELECT year, month, employees, total_base, total_deductions, total_spent, refreshed_at
+FROM salary_report_totals
+WHERE batch = '*'
+ON CONFLICT (year, month) DO NOTHING;
+
+DELETE FROM salary_report_totals WHERE batch = '*';
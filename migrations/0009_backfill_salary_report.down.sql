@@ -0,0 +1,2 @@
+-- Data only: the backfilled rows are what a payroll run would write, so they stay
+SELECT 1;
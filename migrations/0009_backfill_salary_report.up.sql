@@ -0,0 +1,31 @@
+-- Fill the materialized salary report (0003, 0008) for every month already in
+-- salary_logs. Until now only a new payroll run filled it, so months computed
+-- before the report existed read back empty. Same rows as
+-- models/salary_report.refresh(), for all months at once; amounts older code
+-- left NULL count as 0.
+
+DELETE FROM salary_report_monthly;
+INSERT INTO salary_report_monthly (
+    year, month, user_id, name, batch, base_salary, total_deductions, final_salary
+)
+SELECT s.year, s.month, s.user_id, u.name, u.batch, COALESCE(s.base_salary, 0),
+       COALESCE(s.late_deductions, 0) + COALESCE(s.early_deductions, 0), COALESCE(s.final_salary, 0)
+FROM salary_logs s
+JOIN users u ON s.user_id = u.id;
+
+DELETE FROM salary_report_totals;
+INSERT INTO salary_report_totals (
+    year, month, batch, employees, total_base, total_deductions, total_spent
+)
+SELECT year, month, COALESCE(batch, ''),
+       COUNT(*), SUM(base_salary), SUM(total_deductions), SUM(final_salary)
+FROM salary_report_monthly
+GROUP BY year, month, COALESCE(batch, '');
+
+DELETE FROM salary_report_overall;
+INSERT INTO salary_report_overall (
+    year, month, employees, total_base, total_deductions, total_spent
+)
+SELECT year, month, COUNT(*), SUM(base_salary), SUM(total_deductions), SUM(final_salary)
+FROM salary_report_monthly
+GROUP BY year, month;
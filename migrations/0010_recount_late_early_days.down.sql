@@ -0,0 +1,13 @@
+UPDATE attendance_monthly m
+SET late_days = c.late_days, early_days = c.early_days
+FROM (
+    SELECT user_id,
+           EXTRACT(YEAR FROM date)::int AS year,
+           EXTRACT(MONTH FROM date)::int AS month,
+           COUNT(*) FILTER (WHERE COALESCE(is_late, FALSE) OR COALESCE(late_minutes, 0) > 10) AS late_days,
+           COUNT(*) FILTER (WHERE COALESCE(is_early_leave, FALSE) OR COALESCE(early_minutes, 0) > 10) AS early_days
+    FROM attendance
+    GROUP BY 1, 2, 3
+) c
+WHERE m.user_id = c.user_id AND m.year = c.year AND m.month = c.month
+  AND (m.late_days, m.early_days) IS DISTINCT FROM (c.late_days, c.early_days);
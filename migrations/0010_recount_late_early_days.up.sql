@@ -0,0 +1,18 @@
+-- Late / early days no longer get a second 10-minute grace on top of the shift
+-- policy's own (models/attendance_summary.py LATE_EXPR / EARLY_EXPR). Recount
+-- the stored monthly counters with the new rule so the summary payroll source
+-- agrees with the raw rows.
+
+UPDATE attendance_monthly m
+SET late_days = c.late_days, early_days = c.early_days
+FROM (
+    SELECT user_id,
+           EXTRACT(YEAR FROM date)::int AS year,
+           EXTRACT(MONTH FROM date)::int AS month,
+           COUNT(*) FILTER (WHERE COALESCE(is_late, FALSE) OR COALESCE(late_minutes, 0) > 0) AS late_days,
+           COUNT(*) FILTER (WHERE COALESCE(is_early_leave, FALSE) OR COALESCE(early_minutes, 0) > 0) AS early_days
+    FROM attendance
+    GROUP BY 1, 2, 3
+) c
+WHERE m.user_id = c.user_id AND m.year = c.year AND m.month = c.month
+  AND (m.late_days, m.early_days) IS DISTINCT FROM (c.late_days, c.early_days);
@@ -1,24 +1,26 @@
 from db import get_connection
-from datetime import datetime, time
+from datetime import datetime
 import psycopg2.extras
+from utils.pagination import DEFAULT_LIMIT, fetch_limit, history_filter, split_page
+from utils.rows import RecordCursor
+from models.attendance_summary import check_in_cte, check_out_cte, CHECK_IN_RETURNING, EARLY_EXPR
+from models.versions import bump_cte
+from utils import shift_policy
 
 
-# Calculate late minutes
-def calculate_late_minutes(check_in_time):
-    late_limit = time(9, 40)
-    if check_in_time <= late_limit:
-        return 0
-    delta = datetime.combine(datetime.today(), check_in_time) - datetime.combine(datetime.today(), late_limit)
-    return delta.seconds // 60
+# Calculate late minutes under the user's shift policy
+def calculate_late_minutes(user_id, check_in_time):
+    return shift_policy.late_minutes(user_id, check_in_time)
 
 
-# Calculate early leave minutes
-def calculate_early_minutes(check_out_time):
-    early_limit = time(17, 50)
-    if check_out_time >= early_limit:
-        return 0
-    delta = datetime.combine(datetime.today(), early_limit) - datetime.combine(datetime.today(), check_out_time)
-    return delta.seconds // 60
+# Calculate early leave minutes under the user's shift policy
+def calculate_early_minutes(user_id, check_out_time):
+    return shift_policy.early_minutes(user_id, check_out_time)
+
+
+# Columns the check-in / check-out paths may write (column names are never user input)
+CHECK_IN_COLUMNS = ("checkin_time", "is_late", "check_in", "late_minutes", "is_present")
+CHECK_OUT_COLUMNS = ("checkout_time", "is_early_leave", "check_out", "early_minutes")
 
 
 # Check if user already checked in today
@@ -31,22 +33,69 @@ def is_already_checked_in(user_id, today):
     return result
 
 
+# Insert-if-absent check-ins in one statement. rows are (user_id, date, *values) matching
+# `columns`; relies on the UNIQUE (user_id, date) constraint so concurrent taps can't
+# create duplicates. Returns the set of (user_id, date) actually inserted.
+def insert_check_ins(cursor, columns, rows):
+    if not set(columns) <= set(CHECK_IN_COLUMNS):
+        raise ValueError("Unknown check-in column")
+    sql = f"""
+        WITH ins AS (
+            INSERT INTO attendance (user_id, date, {", ".join(columns)})
+            VALUES %s
+            ON CONFLICT (user_id, date) DO NOTHING
+            RETURNING {CHECK_IN_RETURNING}
+        ), {check_in_cte("ins")}, {bump_cte("ins", "attendance_version")}
+        SELECT user_id, date FROM ins
+    """
+    inserted = psycopg2.extras.execute_values(cursor, sql, rows, page_size=max(len(rows), 1), fetch=True)
+    return {(row[0], row[1]) for row in inserted}
+
+
+def insert_check_in(cursor, user_id, day, values):
+    columns = tuple(values)
+    return bool(insert_check_ins(cursor, columns, [(user_id, day, *values.values())]))
+
+
+# Conditional check-out in one statement: only updates a row that is checked in and not
+# yet checked out. Returns "ok", "missing" (no check-in) or "done" (already checked out).
+def update_check_out(cursor, user_id, day, values, done_column):
+    if not set(values) <= set(CHECK_OUT_COLUMNS) or done_column not in CHECK_OUT_COLUMNS:
+        raise ValueError("Unknown check-out column")
+    assignments = ", ".join(f"{col} = %s" for col in values)
+    cursor.execute(f"""
+        WITH upd AS (
+            UPDATE attendance SET {assignments}
+            WHERE user_id = %s AND date = %s AND {done_column} IS NULL
+            RETURNING user_id, date, ({EARLY_EXPR}) AS early
+        ), {check_out_cte("upd")}, {bump_cte("upd", "attendance_version")}
+        SELECT EXISTS (SELECT 1 FROM upd),
+               EXISTS (SELECT 1 FROM attendance WHERE user_id = %s AND date = %s)
+    """, [*values.values(), user_id, day, user_id, day])
+    updated, exists = cursor.fetchone()
+    if updated:
+        return "ok"
+    return "done" if exists else "missing"
+
+
 # Perform check-in
 def perform_check_in(user_id):
     now = datetime.now()
     today = now.date()
     check_in_time = now.time()
-    late_minutes = calculate_late_minutes(check_in_time)
+    late_minutes = calculate_late_minutes(user_id, check_in_time)
 
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO attendance (user_id, date, check_in, late_minutes, is_present)
-        VALUES (%s, %s, %s, %s, %s)
-    """, (user_id, today, check_in_time, late_minutes, True))
+    inserted = insert_check_in(cursor, user_id, today, {
+        "check_in": check_in_time, "late_minutes": late_minutes, "is_present": True
+    })
     conn.commit()
     conn.close()
 
+    if not inserted:
+        return {"error": "Already checked in"}, 400
+
     return {
         "check_in_time": str(check_in_time),
         "late_minutes": late_minutes
@@ -58,47 +107,40 @@ def perform_check_out(user_id):
     now = datetime.now()
     today = now.date()
     check_out_time = now.time()
-    early_minutes = calculate_early_minutes(check_out_time)
+    early_minutes = calculate_early_minutes(user_id, check_out_time)
 
     conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    # Fetch check-in record
-    cursor.execute("SELECT * FROM attendance WHERE user_id = %s AND date = %s", (user_id, today))
-    record = cursor.fetchone()
+    cursor = conn.cursor()
+    status = update_check_out(cursor, user_id, today, {
+        "check_out": check_out_time, "early_minutes": early_minutes
+    }, "check_out")
+    conn.commit()
+    conn.close()
 
-    if not record:
-        conn.close()
+    if status == "missing":
         return {"error": "No check-in found for today"}, 404
-
-    if record["check_out"]:
-        conn.close()
+    if status == "done":
         return {"error": "Already checked out"}, 400
 
-    cursor.execute("""
-        UPDATE attendance
-        SET check_out = %s, early_minutes = %s
-        WHERE user_id = %s AND date = %s
-    """, (check_out_time, early_minutes, user_id, today))
-    conn.commit()
-    conn.close()
-
     return {
         "check_out_time": str(check_out_time),
         "early_minutes": early_minutes
     }
 
 
-# Get full attendance log
-def get_attendance_log(user_id):
+# Get one page of the attendance log (newest first) and the cursor for the next page;
+# limit=None returns the whole log
+def get_attendance_log(user_id, limit=DEFAULT_LIMIT, before=None, start=None, end=None):
+    extra, params = history_filter(before, start, end)
     conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor = conn.cursor(cursor_factory=RecordCursor)
     cursor.execute("""
         SELECT date, check_in, check_out, late_minutes, early_minutes, is_present, is_paid_leave
         FROM attendance
-        WHERE user_id = %s
+        WHERE user_id = %s""" + extra + """
         ORDER BY date DESC
-    """, (user_id,))
+        LIMIT %s
+    """, [user_id, *params, fetch_limit(limit)])
     logs = cursor.fetchall()
     conn.close()
-    return logs
+    return split_page(logs, limit, lambda row: row["date"])
@@ -0,0 +1,108 @@
+from db import get_connection
+from utils.payroll import month_range
+from utils.rows import RecordCursor
+
+# Per-user-per-month attendance counters, kept up to date by the check-in/check-out
+# paths so payroll and dashboards read one row per user instead of a month of rows.
+# The table is created by migrations/0003_auxiliary_tables.
+
+REBUILD_SQL = """
+    INSERT INTO attendance_monthly (
+        user_id, year, month, present_days, late_days, early_days, paid_leave_days, permission_days
+    )
+    SELECT user_id,
+           EXTRACT(YEAR FROM date)::int,
+           EXTRACT(MONTH FROM date)::int,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE {late}),
+           COUNT(*) FILTER (WHERE {early}),
+           COUNT(*) FILTER (WHERE {paid_leave}),
+           COUNT(*) FILTER (WHERE {permission})
+    FROM attendance
+    WHERE date >= %(start)s AND date < %(end)s
+    GROUP BY 1, 2, 3
+"""
+
+# SQL for "counts as late / early" over an attendance row. The shift policy's
+# grace is already part of late_minutes / early_minutes (utils/shift_policy.py),
+# so any minute counts.
+LATE_EXPR = "COALESCE(is_late, FALSE) OR COALESCE(late_minutes, 0) > 0"
+EARLY_EXPR = "COALESCE(is_early_leave, FALSE) OR COALESCE(early_minutes, 0) > 0"
+PAID_LEAVE_EXPR = "COALESCE(is_paid_leave, FALSE)"
+PERMISSION_EXPR = "COALESCE(permission_used::int, 0) <> 0"
+
+
+# CTE that bumps the counters for the rows RETURNING from the check-in CTE named
+# `source` (columns user_id, date, late, paid_leave, permission). Folded into the
+# same statement so a check-in stays one round trip.
+def check_in_cte(source):
+    return f"""
+        summary AS (
+            INSERT INTO attendance_monthly (
+                user_id, year, month, present_days, late_days, paid_leave_days, permission_days
+            )
+            SELECT user_id, EXTRACT(YEAR FROM date)::int, EXTRACT(MONTH FROM date)::int, 1,
+                   late::int, paid_leave::int, permission::int
+            FROM {source}
+            ON CONFLICT (user_id, year, month) DO UPDATE SET
+                present_days = attendance_monthly.present_days + 1,
+                late_days = attendance_monthly.late_days + EXCLUDED.late_days,
+                paid_leave_days = attendance_monthly.paid_leave_days + EXCLUDED.paid_leave_days,
+                permission_days = attendance_monthly.permission_days + EXCLUDED.permission_days
+        )"""
+
+# RETURNING list a check-in statement feeds to check_in_cte
+CHECK_IN_RETURNING = (f"user_id, date, ({LATE_EXPR}) AS late, ({PAID_LEAVE_EXPR}) AS paid_leave, "
+                      f"({PERMISSION_EXPR}) AS permission")
+
+
+# Same for check-out: `source` has user_id, date, early
+def check_out_cte(source):
+    return f"""
+        summary AS (
+            UPDATE attendance_monthly m SET early_days = m.early_days + 1
+            FROM {source} s
+            WHERE s.early AND m.user_id = s.user_id
+              AND m.year = EXTRACT(YEAR FROM s.date)::int AND m.month = EXTRACT(MONTH FROM s.date)::int
+        )"""
+
+
+# Recompute the summary from raw attendance (backfills, manual corrections).
+# With no year, every month is rebuilt.
+def rebuild(year=None, month=None):
+    if year is None:
+        start, end = "-infinity", "infinity"
+    elif month is None:
+        start, end = month_range(year, 1)[0], month_range(year, 12)[1]
+    else:
+        start, end = month_range(year, month)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    if year is None:
+        cursor.execute("DELETE FROM attendance_monthly")
+    elif month is None:
+        cursor.execute("DELETE FROM attendance_monthly WHERE year = %s", (year,))
+    else:
+        cursor.execute("DELETE FROM attendance_monthly WHERE year = %s AND month = %s", (year, month))
+    sql = REBUILD_SQL.format(late=LATE_EXPR, early=EARLY_EXPR, paid_leave=PAID_LEAVE_EXPR, permission=PERMISSION_EXPR)
+    cursor.execute(sql, {"start": start, "end": end})
+    rows = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return rows
+
+
+# Month summary for dashboards (optionally one user)
+def get_month_summary(year, month, user_id=None):
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=RecordCursor)
+    sql = "SELECT * FROM attendance_monthly WHERE year = %s AND month = %s"
+    params = [year, month]
+    if user_id is not None:
+        sql += " AND user_id = %s"
+        params.append(user_id)
+    cursor.execute(sql + " ORDER BY user_id", params)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
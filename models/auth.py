@@ -1,7 +1,7 @@
 # auth.py
 
 from flask import Blueprint, request, jsonify
-from user_model import get_user_by_email, verify_password
+from models.user_model import get_user_by_email, verify_password
 
 auth_bp = Blueprint('auth', __name__)
 
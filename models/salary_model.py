@@ -1,5 +1,8 @@
 from db import get_connection
-from calendar import monthrange
+from models.versions import bump
+from models import salary_report
+from utils.payroll import load_month_counts, compute_payroll, result_at, upsert_salary, days_in
+import time
 import psycopg2.extras
 
 # Salary rules
@@ -10,99 +13,197 @@ LATE_CUT_PERCENT = 20
 EARLY_CUT_PERCENT = 20
 BONUS_DAY_PAY = 1  # one-day bonus if perfect attendance
 
-def calculate_salary_for_user(user_id, year, month):
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+# salary_logs rules (monthly salary based)
+LOG_DAYS_PER_MONTH = 30
+LOG_LATE_CUT_PERCENT = 20
+LOG_EARLY_CUT_PERCENT = 20
 
-    # Get total days in month
-    days_in_month = monthrange(year, month)[1]
-    start_date = f"{year}-{month:02d}-01"
-    end_date = f"{year}-{month:02d}-{days_in_month:02d}"
-
-    # Fetch attendance records
-    cursor.execute("""
-        SELECT * FROM attendance
-        WHERE user_id = %s AND date BETWEEN %s AND %s
-    """, (user_id, start_date, end_date))
-    records = cursor.fetchall()
-
-    # Initialize
-    present_days = 0
-    paid_leave = 0
-    permission_used = 0
-    late_deduct = 0
-    early_deduct = 0
-    bonus = 0
-
-    for rec in records:
-        present_days += 1
-        if rec.get("is_paid_leave"):
-            paid_leave += 1
-        if rec.get("permission_used"):
-            permission_used += 1
-        if rec.get("late_minutes", 0) > 10:
-            late_deduct += SALARY_PER_DAY * (LATE_CUT_PERCENT / 100)
-        if rec.get("early_minutes", 0) > 10:
-            early_deduct += SALARY_PER_DAY * (EARLY_CUT_PERCENT / 100)
-
-    total_base_salary = present_days * SALARY_PER_DAY
-
-    # Unpaid leave deduction
-    unpaid_leaves = max(0, paid_leave - PAID_LEAVE_DAYS)
-    unpaid_leave_deduct = unpaid_leaves * SALARY_PER_DAY
-
-    # Permission deduction
-    total_permission_minutes = permission_used * 60
-    excess_permission = max(0, total_permission_minutes - PERMISSION_MINUTES)
-    permission_deduct = (excess_permission / 60) * SALARY_PER_DAY
-
-    # Bonus logic
-    if present_days == days_in_month and paid_leave == 0 and permission_used == 0:
-        bonus = SALARY_PER_DAY * BONUS_DAY_PAY
-
-    total_deductions = late_deduct + early_deduct + unpaid_leave_deduct + permission_deduct
-    final_salary = total_base_salary - total_deductions + bonus
 
+# Recompute the salary table for user_ids. Bumps each user's salary version, or
+# the global one when the whole staff list is recomputed (all_users).
+def _compute(cursor, user_ids, year, month, all_users=False):
+    days_in_month = days_in(year, month)
+    counts = load_month_counts(cursor, year, month, user_ids)
+    result = compute_payroll(
+        counts, days_in_month, SALARY_PER_DAY,
+        paid_leave_days=PAID_LEAVE_DAYS,
+        permission_minutes=PERMISSION_MINUTES,
+        late_cut_percent=LATE_CUT_PERCENT,
+        early_cut_percent=EARLY_CUT_PERCENT,
+        bonus_amount=SALARY_PER_DAY * BONUS_DAY_PAY,
+        bonus_leave_limit=0,
+    )
     # Insert or update (PostgreSQL-specific UPSERT using ON CONFLICT)
-    cursor.execute("""
-        INSERT INTO salary (
-            user_id, month, year, total_days, total_present,
-            paid_leave, permissions_used, late_deductions,
-            early_deductions, total_deductions, total_additions, final_salary
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (user_id, month, year) DO UPDATE SET
-            total_days = EXCLUDED.total_days,
-            total_present = EXCLUDED.total_present,
-            paid_leave = EXCLUDED.paid_leave,
-            permissions_used = EXCLUDED.permissions_used,
-            late_deductions = EXCLUDED.late_deductions,
-            early_deductions = EXCLUDED.early_deductions,
-            total_deductions = EXCLUDED.total_deductions,
-            total_additions = EXCLUDED.total_additions,
-            final_salary = EXCLUDED.final_salary
-    """, (
-        user_id, month, year, days_in_month, present_days, paid_leave,
-        permission_used, late_deduct, early_deduct,
-        total_deductions, bonus, final_salary
-    ))
+    upsert_salary(cursor, user_ids, year, month, days_in_month, result)
+    bump(cursor, "salary_version", None if all_users else user_ids)
+    return days_in_month, result
+
+
+# Dirty marks (user_id, version, is_staff) for one month, read before computing
+def _dirty_marks(cursor, year, month, user_id=None):
+    sql = """
+        SELECT d.user_id, d.version, COALESCE(u.role = 'user', FALSE)
+        FROM payroll_dirty d
+        LEFT JOIN users u ON u.id = d.user_id
+        WHERE d.year = %s AND d.month = %s
+    """
+    params = [year, month]
+    if user_id is not None:
+        sql += " AND d.user_id = %s"
+        params.append(user_id)
+    cursor.execute(sql + " ORDER BY d.user_id", params)
+    return cursor.fetchall()
+
+
+# Clear the marks that were read, unless attendance changed again since (version moved on)
+def _clear_dirty(cursor, year, month, marks):
+    if not marks:
+        return
+    psycopg2.extras.execute_values(cursor, """
+        DELETE FROM payroll_dirty d
+        USING (VALUES %s) AS v(user_id, year, month, version)
+        WHERE d.user_id = v.user_id AND d.year = v.year AND d.month = v.month AND d.version = v.version
+    """, [(uid, year, month, version) for uid, version, _ in marks])
 
+
+def calculate_salary_for_user(user_id, year, month):
+    conn = get_connection()
+    cursor = conn.cursor()
+    marks = _dirty_marks(cursor, year, month, user_id)
+    days_in_month, result = _compute(cursor, [user_id], year, month)
+    _clear_dirty(cursor, year, month, marks)
     conn.commit()
     conn.close()
 
+    r = result_at(result, 0)
     return {
         "user_id": user_id,
         "month": month,
         "year": year,
         "days_in_month": days_in_month,
-        "present_days": present_days,
-        "paid_leave_used": paid_leave,
-        "permission_used": permission_used,
-        "late_deductions": late_deduct,
-        "early_deductions": early_deduct,
-        "unpaid_leave_deduct": unpaid_leave_deduct,
-        "permission_deduct": permission_deduct,
-        "total_deductions": total_deductions,
-        "bonus": bonus,
-        "final_salary": final_salary
+        "present_days": r["present"],
+        "paid_leave_used": r["paid_leave"],
+        "permission_used": r["permission"],
+        "late_deductions": r["late_deductions"],
+        "early_deductions": r["early_deductions"],
+        "unpaid_leave_deduct": r["unpaid_leave_deduct"],
+        "permission_deduct": r["permission_deduct"],
+        "total_deductions": r["total_deductions"],
+        "bonus": r["bonus"],
+        "final_salary": r["final_salary"]
+    }
+
+
+# Salary table for every staff member in one vectorized pass
+def calculate_salary_for_all(year, month):
+    started = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor()
+    marks = _dirty_marks(cursor, year, month)
+    cursor.execute("SELECT id FROM users WHERE role = 'user' ORDER BY id")
+    user_ids = [row[0] for row in cursor.fetchall()]
+    _compute(cursor, user_ids, year, month, all_users=True)
+    _clear_dirty(cursor, year, month, marks)
+    conn.commit()
+    conn.close()
+    return _timing(len(user_ids), started)
+
+
+# Incremental mode: recompute the salary table only for (user, month) pairs whose
+# attendance changed since their last computation (optionally one month only)
+def calculate_salary_dirty(year=None, month=None):
+    started = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor()
+    sql = "SELECT DISTINCT year, month FROM payroll_dirty"
+    params = []
+    if year is not None:
+        sql += " WHERE year = %s"
+        params.append(year)
+        if month is not None:
+            sql += " AND month = %s"
+            params.append(month)
+    cursor.execute(sql + " ORDER BY year, month", params)
+    months = cursor.fetchall()
+
+    users = 0
+    for y, m in months:
+        marks = _dirty_marks(cursor, y, m)
+        staff = [uid for uid, _, is_staff in marks if is_staff]
+        if staff:
+            _compute(cursor, staff, y, m)
+        _clear_dirty(cursor, y, m, marks)
+        users += len(staff)
+    conn.commit()
+    conn.close()
+    return {**_timing(users, started), "months": [f"{y}-{m:02d}" for y, m in months]}
+
+
+# salary_logs rows for the given (id, monthly salary) users: one columnar read
+# + one multi-row upsert. Runs in the caller's transaction; returns rows written.
+def _upsert_salary_logs(cursor, users, month, year):
+    user_ids = [row[0] for row in users]
+    monthly = [float(row[1] or 0) for row in users]
+
+    counts = load_month_counts(cursor, year, month, user_ids)
+    result = compute_payroll(
+        counts, days_in(year, month),
+        per_day=[m / LOG_DAYS_PER_MONTH for m in monthly],
+        base_salary=monthly,
+        paid_leave_days=None,
+        permission_minutes=None,
+        late_cut_percent=LOG_LATE_CUT_PERCENT,
+        early_cut_percent=LOG_EARLY_CUT_PERCENT,
+        bonus_amount=0,
+    )
+
+    rows = list(zip(
+        user_ids,
+        [month] * len(user_ids),
+        [year] * len(user_ids),
+        result["base"].tolist(),
+        result["late_deductions"].tolist(),
+        result["early_deductions"].tolist(),
+        result["final_salary"].tolist(),
+    ))
+    if rows:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO salary_logs (user_id, month, year, base_salary, late_deductions, early_deductions, final_salary)
+            VALUES %s
+            ON CONFLICT (user_id, month, year) DO UPDATE SET
+                base_salary = EXCLUDED.base_salary,
+                late_deductions = EXCLUDED.late_deductions,
+                early_deductions = EXCLUDED.early_deductions,
+                final_salary = EXCLUDED.final_salary
+        """, rows, page_size=1000)
+    return len(rows)
+
+
+# salary_logs for one user-id range of a payroll job (caller commits). The
+# range's users get their salary version bumped in the same transaction, so a
+# job that fails after this range committed does not leave stale ETags behind.
+def run_payroll_range(cursor, month, year, first_id, last_id):
+    cursor.execute("""
+        SELECT id, salary FROM users
+        WHERE role = 'user' AND id BETWEEN %s AND %s
+        ORDER BY id
+    """, (first_id, last_id))
+    users = cursor.fetchall()
+    rows = _upsert_salary_logs(cursor, users, month, year)
+    bump(cursor, "salary_version", [row[0] for row in users])
+    return rows
+
+
+# Finishing step of a payroll job once every range is written (caller commits)
+def finish_payroll(cursor, month, year):
+    bump(cursor, "salary_version")
+    salary_report.refresh(cursor, year, month)
+
+
+def _timing(rows, started):
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0
     }
@@ -0,0 +1,107 @@
+from db import get_connection
+import psycopg2.extras
+
+# Materialized monthly salary report. Refreshed inside the payroll transaction
+# (/admin/calculate-salary) so the dashboard endpoints serve stored rows and
+# totals instead of re-joining salary_logs and summing on every request.
+# Tables are created by migrations/0003_auxiliary_tables; the all-batches total
+# lives in salary_report_overall (0008) so no batch name can collide with it.
+
+# Rebuild one month of the report from salary_logs (runs in the caller's transaction)
+def refresh(cursor, year, month):
+    cursor.execute("DELETE FROM salary_report_monthly WHERE year = %s AND month = %s", (year, month))
+    cursor.execute("""
+        INSERT INTO salary_report_monthly (
+            year, month, user_id, name, batch, base_salary, total_deductions, final_salary
+        )
+        SELECT s.year, s.month, s.user_id, u.name, u.batch, COALESCE(s.base_salary, 0),
+               COALESCE(s.late_deductions, 0) + COALESCE(s.early_deductions, 0), COALESCE(s.final_salary, 0)
+        FROM salary_logs s
+        JOIN users u ON s.user_id = u.id
+        WHERE s.year = %s AND s.month = %s
+    """, (year, month))
+
+    # One row per batch; staff without a batch go under ''
+    cursor.execute("DELETE FROM salary_report_totals WHERE year = %s AND month = %s", (year, month))
+    cursor.execute("""
+        INSERT INTO salary_report_totals (
+            year, month, batch, employees, total_base, total_deductions, total_spent
+        )
+        SELECT %s, %s, COALESCE(batch, ''),
+               COUNT(*), SUM(base_salary), SUM(total_deductions), SUM(final_salary)
+        FROM salary_report_monthly
+        WHERE year = %s AND month = %s
+        GROUP BY COALESCE(batch, '')
+    """, (year, month, year, month))
+
+    cursor.execute("DELETE FROM salary_report_overall WHERE year = %s AND month = %s", (year, month))
+    cursor.execute("""
+        INSERT INTO salary_report_overall (
+            year, month, employees, total_base, total_deductions, total_spent
+        )
+        SELECT %s, %s,
+               COUNT(*),
+               COALESCE(SUM(base_salary), 0),
+               COALESCE(SUM(total_deductions), 0),
+               COALESCE(SUM(final_salary), 0)
+        FROM salary_report_monthly
+        WHERE year = %s AND month = %s
+    """, (year, month, year, month))
+
+
+def refresh_month(year, month):
+    conn = get_connection()
+    cursor = conn.cursor()
+    refresh(cursor, year, month)
+    conn.commit()
+    conn.close()
+
+
+# Returns (rows, totals by batch, overall totals or None)
+def get_report(year, month, batch=None):
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    sql = """
+        SELECT user_id, name, batch, base_salary, total_deductions, final_salary
+        FROM salary_report_monthly
+        WHERE year = %s AND month = %s
+    """
+    params = [year, month]
+    if batch is not None:
+        sql += " AND COALESCE(batch, '') = %s"
+        params.append(batch)
+    cursor.execute(sql + " ORDER BY name", params)
+    rows = cursor.fetchall()
+    cursor.execute("""
+        SELECT batch, employees, total_base, total_deductions, total_spent, refreshed_at
+        FROM salary_report_totals
+        WHERE year = %s AND month = %s
+    """, (year, month))
+    totals = {row["batch"]: row for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT employees, total_base, total_deductions, total_spent, refreshed_at
+        FROM salary_report_overall
+        WHERE year = %s AND month = %s
+    """, (year, month))
+    overall = cursor.fetchone()
+    conn.close()
+    return rows, totals, overall
+
+
+# Total spent for one batch, or for all of them when batch is None
+def get_total(year, month, batch=None):
+    conn = get_connection()
+    cursor = conn.cursor()
+    if batch is None:
+        cursor.execute("""
+            SELECT total_spent FROM salary_report_overall
+            WHERE year = %s AND month = %s
+        """, (year, month))
+    else:
+        cursor.execute("""
+            SELECT total_spent FROM salary_report_totals
+            WHERE year = %s AND month = %s AND batch = %s
+        """, (year, month, batch))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else 0
@@ -2,33 +2,37 @@
 
 from db import get_connection
 import psycopg2.extras
-import bcrypt
+from utils.passwords import check_password, generate_password, hash_password, hash_passwords
+from utils.cache import cache
 
-# Get user by email (for login)
-def get_user_by_email(email):
+# Cached user rows: everything but the password hash, salaries as plain floats
+USER_COLUMNS = ("id, name, email, phone, age, batch, salary::float8 AS salary, "
+                "salary_per_month::float8 AS salary_per_month, role")
+
+def _fetch_one(sql, params):
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-    user = cursor.fetchone()
+    cursor.execute(sql, params)
+    row = cursor.fetchone()
     conn.close()
-    return user
+    return dict(row) if row else None
+
+# Get user by email (for login). Not cached: the row carries the password hash.
+def get_user_by_email(email):
+    return _fetch_one("SELECT * FROM users WHERE email = %s", (email,))
 
 # Verify password (hashed)
 def verify_password(input_password, stored_hash):
-    return bcrypt.checkpw(input_password.encode(), stored_hash.encode())
+    return check_password(input_password, stored_hash)
 
 # Get user by ID
 def get_user_by_id(user_id):
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    return cache.get_or_load(f"user:id:{user_id}",
+                             lambda: _fetch_one(f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", (user_id,)))
 
 # Register new user (admin/staff)
 def register_user(name, email, phone, age, batch, salary, role="user", password="123456"):
-    hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    hashed_password = hash_password(password)
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
@@ -37,12 +41,101 @@ def register_user(name, email, phone, age, batch, salary, role="user", password=
     """, (name, email, phone, age, batch, salary, role, hashed_password))
     conn.commit()
     conn.close()
+    invalidate_staff_cache()
+
+# Validate one onboarding row; returns (cleaned row, None) or (None, error)
+def _clean_staff(row):
+    if not isinstance(row, dict):
+        return None, "Expected an object"
+    cleaned = {}
+    for field in ("name", "email", "phone"):
+        value = str(row.get(field) or "").strip()
+        if not value:
+            return None, f"Missing {field}"
+        cleaned[field] = value
+    batch = str(row.get("batch") or "").strip()
+    cleaned["batch"] = batch or None
+    try:
+        cleaned["salary"] = float(row["salary"])
+        cleaned["age"] = int(row["age"]) if row.get("age") not in (None, "") else None
+    except (KeyError, TypeError, ValueError):
+        return None, "Missing or invalid salary / age"
+    return cleaned, None
+
+
+# Onboard many staff at once. Passwords are generated, hashed across the
+# password pool and inserted with one multi-row statement. Returns one result
+# per input row, in order: "created" (with id and the plain password, shown
+# once), "invalid" or "duplicate" (email already taken or repeated in the
+# batch). Bad rows never fail the rest of the batch.
+def register_users(staff):
+    results = [None] * len(staff)
+    pending = []
+    seen = set()
+    for i, row in enumerate(staff):
+        cleaned, error = _clean_staff(row)
+        email = cleaned["email"] if cleaned else (row.get("email") if isinstance(row, dict) else None)
+        if error:
+            results[i] = {"row": i + 1, "email": email, "status": "invalid", "error": error}
+        elif email in seen:
+            results[i] = {"row": i + 1, "email": email, "status": "duplicate", "error": "Email repeated in this batch"}
+        else:
+            seen.add(email)
+            pending.append((i, cleaned))
+
+    if pending:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT email FROM users WHERE email = ANY(%s)", ([c["email"] for _, c in pending],))
+        existing = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        for i, cleaned in pending:
+            if cleaned["email"] in existing:
+                results[i] = {"row": i + 1, "email": cleaned["email"], "status": "duplicate",
+                              "error": "Email already exists"}
+        pending = [(i, c) for i, c in pending if c["email"] not in existing]
+
+    if pending:
+        passwords = [generate_password() for _ in pending]
+        hashes = hash_passwords(passwords)
+        conn = get_connection()
+        cursor = conn.cursor()
+        # ON CONFLICT covers emails registered since the check above
+        inserted = psycopg2.extras.execute_values(cursor, """
+            INSERT INTO users (name, email, phone, age, batch, salary, salary_per_month, password, role)
+            VALUES %s
+            ON CONFLICT (email) DO NOTHING
+            RETURNING id, email
+        """, [
+            (c["name"], c["email"], c["phone"], c["age"], c["batch"], c["salary"], c["salary"], hashed, "user")
+            for (_, c), hashed in zip(pending, hashes)
+        ], page_size=len(pending), fetch=True)
+        conn.commit()
+        conn.close()
+        ids = {email: user_id for user_id, email in inserted}
+        for (i, cleaned), password in zip(pending, passwords):
+            email = cleaned["email"]
+            if email in ids:
+                results[i] = {"row": i + 1, "email": email, "status": "created", "id": ids[email],
+                              "password": password}
+            else:
+                results[i] = {"row": i + 1, "email": email, "status": "duplicate", "error": "Email already exists"}
+        if ids:
+            invalidate_staff_cache()
+    return results
 
 # Get all staff users
 def get_all_staff():
+    return cache.get_or_load("staff:all", _load_all_staff)
+
+def _load_all_staff():
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("SELECT * FROM users WHERE role = 'user'")
-    result = cursor.fetchall()
+    cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE role = 'user'")
+    result = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return result
+
+# Drop cached user/staff lookups after any write to users
+def invalidate_staff_cache():
+    cache.invalidate("user", "staff")
@@ -0,0 +1,68 @@
+from db import get_connection
+from flask import request, make_response
+import hashlib
+
+# Per-user change counters for attendance and salary data. Read endpoints build
+# their ETag from these, so answering If-None-Match is one primary-key lookup and
+# never touches the attendance / salary tables. Row user_id = 0 holds the global
+# counters bumped by payroll runs that touch every user. Table: migrations/0003.
+
+GLOBAL_ROW = 0
+KINDS = ("attendance_version", "salary_version")
+
+# CTE that bumps `column` for every user_id returned by the CTE named `source`
+def bump_cte(source, column):
+    if column not in KINDS:
+        raise ValueError("Unknown version column")
+    return f"""
+        versions AS (
+            INSERT INTO resource_versions (user_id, {column})
+            SELECT DISTINCT user_id, 1 FROM {source}
+            ON CONFLICT (user_id) DO UPDATE SET {column} = resource_versions.{column} + 1
+        )"""
+
+
+# Bump `column` for the given users (inside the caller's transaction); no users = global row
+def bump(cursor, column, user_ids=None):
+    if column not in KINDS:
+        raise ValueError("Unknown version column")
+    ids = list(user_ids) if user_ids is not None else [GLOBAL_ROW]
+    cursor.execute(f"""
+        INSERT INTO resource_versions (user_id, {column})
+        SELECT unnest(%s::int[]), 1
+        ON CONFLICT (user_id) DO UPDATE SET {column} = resource_versions.{column} + 1
+    """, (ids,))
+
+
+def current_version(column, user_id):
+    if column not in KINDS:
+        raise ValueError("Unknown version column")
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT COALESCE(MAX({column}) FILTER (WHERE user_id = %s), 0),
+               COALESCE(MAX({column}) FILTER (WHERE user_id = %s), 0)
+        FROM resource_versions
+        WHERE user_id IN (%s, %s)
+    """, (user_id, GLOBAL_ROW, user_id, GLOBAL_ROW))
+    user_version, global_version = cursor.fetchone()
+    conn.close()
+    return f"{user_version}.{global_version}"
+
+
+# Serve build() with an ETag, or 304 when the client's copy is still current.
+# The query string is part of the tag so each page / filter has its own.
+def conditional_response(column, user_id, build):
+    version = current_version(column, user_id)
+    args = hashlib.sha1(request.query_string).hexdigest()[:8]
+    etag = f"{column.split('_')[0]}-{user_id}-{version}-{args}"
+
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    response = make_response(build())
+    if response.status_code == 200:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,27 @@
+# Tests that need PostgreSQL run against TEST_DB_HOST (plus the usual PG*
+# variables) and are skipped when it is unset or unreachable. DB_HOST is never
+# used here: .env usually points it at a real database.
+
+import os
+import sys
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if os.getenv("TEST_DB_HOST"):
+    os.environ["DB_HOST"] = os.environ["TEST_DB_HOST"]
+
+
+@pytest.fixture(scope="session")
+def database():
+    if not os.getenv("TEST_DB_HOST"):
+        pytest.skip("TEST_DB_HOST is not set")
+    from db import get_connection
+    from utils import migrate
+    try:
+        get_connection().close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"test database not reachable: {e}")
+    migrate.upgrade()
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time
+import threading
+import uuid
+
+import pytest
+
+THREADS = 8
+DAY = date(2031, 5, 6)
+
+
+@pytest.fixture
+def user_id(database):
+    from db import get_connection
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO users (name, email, role) VALUES ('Concurrency test', %s, 'user') RETURNING id",
+                   (f"concurrency-{uuid.uuid4().hex}@example.com",))
+    user_id = cursor.fetchone()[0]
+    conn.commit()
+    yield user_id
+    for table in ("attendance", "attendance_monthly", "payroll_dirty", "resource_versions", "users"):
+        cursor.execute(f"DELETE FROM {table} WHERE {'id' if table == 'users' else 'user_id'} = %s", (user_id,))
+    conn.commit()
+    conn.close()
+
+
+# Runs fn(cursor) on THREADS connections released together; returns the results
+def _race(fn):
+    from db import get_connection
+    barrier = threading.Barrier(THREADS)
+
+    def run(_):
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            barrier.wait()
+            result = fn(cursor)
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        return list(pool.map(run, range(THREADS)))
+
+
+def _rows(user_id):
+    from db import get_connection
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT checkin_time, checkout_time FROM attendance WHERE user_id = %s AND date = %s",
+                   (user_id, DAY))
+    rows = cursor.fetchall()
+    cursor.execute("SELECT present_days FROM attendance_monthly WHERE user_id = %s AND year = %s AND month = %s",
+                   (user_id, DAY.year, DAY.month))
+    summary = cursor.fetchall()
+    conn.close()
+    return rows, summary
+
+
+def test_parallel_check_ins_insert_one_row(user_id):
+    from models.attendance_model import insert_check_in
+
+    results = _race(lambda cursor: insert_check_in(cursor, user_id, DAY, {"checkin_time": time(9, 0)}))
+
+    assert results.count(True) == 1
+    rows, summary = _rows(user_id)
+    assert len(rows) == 1
+    assert summary == [(1,)]
+
+
+def test_parallel_check_outs_update_once(user_id):
+    from models.attendance_model import insert_check_in, update_check_out
+
+    _race(lambda cursor: insert_check_in(cursor, user_id, DAY, {"checkin_time": time(9, 0)}))
+    results = _race(lambda cursor: update_check_out(cursor, user_id, DAY, {"checkout_time": time(18, 0)},
+                                                    "checkout_time"))
+
+    assert results.count("ok") == 1
+    assert results.count("done") == THREADS - 1
+    rows, _ = _rows(user_id)
+    assert rows == [(time(9, 0), time(18, 0))]
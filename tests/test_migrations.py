@@ -0,0 +1,19 @@
+from utils import migrate
+
+
+def test_hot_queries_use_indexes(database):
+    results = migrate.verify_indexes()
+    assert {name for name, _, _ in results} == {name for name, _, _, _ in migrate.HOT_QUERIES}
+    failed = {name: nodes for name, ok, nodes in results if not ok}
+    assert not failed
+
+
+def test_core_tables_refuse_rollback(database):
+    applied = [version for version, _, applied_at in migrate.status() if applied_at]
+    try:
+        migrate.rollback(len(applied))
+    except migrate.IrreversibleMigration:
+        pass
+    else:
+        raise AssertionError("rolling back every step should be refused")
+    assert [version for version, _, applied_at in migrate.status() if applied_at] == applied
@@ -0,0 +1,241 @@
+# attendance_import.py
+#
+# Bulk attendance import from biometric / kiosk CSV exports with columns
+# user_id, date, check_in, check_out (times may be empty). The file is streamed
+# into a temp table with COPY and everything after that is set-based, in one
+# transaction:
+#
+#   1. each row is validated and typed; bad rows are kept with a reason
+#   2. punches for the same (user_id, date) are folded together (first check-in,
+#      last check-out); a day whose folded check-out is before its check-in is
+#      rejected row by row
+#   3. late/early minutes are computed from the compiled shift policies
+#   4. one INSERT .. ON CONFLICT (user_id, date) merges into attendance; times in
+#      the file replace stored ones, times missing from it are left alone
+#
+# The payroll dirty triggers mark every touched (user, month); ETag versions are
+# bumped in the same statement and attendance_monthly is rebuilt for the months
+# touched afterwards. Validation uses pg_input_is_valid, so older servers than
+# PostgreSQL 16 are refused with ImportUnsupported before anything is loaded.
+
+import os
+import time
+import psycopg2
+
+from db import get_connection
+from models import attendance_summary
+from models.versions import bump_cte
+from utils import shift_policy
+
+# Rejected rows listed individually in the result (all of them are counted)
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+# pg_input_is_valid appeared in PostgreSQL 16
+MIN_SERVER_VERSION = 160000
+
+
+class ImportUnsupported(Exception):
+    pass
+
+
+CREATE_STAGING_SQL = """
+    CREATE TEMP TABLE attendance_import_raw (
+        line BIGSERIAL,
+        user_id TEXT,
+        date TEXT,
+        check_in TEXT,
+        check_out TEXT
+    ) ON COMMIT DROP;
+
+    CREATE TEMP TABLE attendance_import_rows (
+        line BIGINT,
+        user_id INTEGER,
+        date DATE,
+        check_in TIME,
+        check_out TIME,
+        error TEXT
+    ) ON COMMIT DROP;
+"""
+
+COPY_SQL = """
+    COPY attendance_import_raw (user_id, date, check_in, check_out)
+    FROM STDIN WITH (FORMAT csv, HEADER {header})
+"""
+
+# Values are only cast once pg_input_is_valid has accepted them
+VALIDATE_SQL = """
+    INSERT INTO attendance_import_rows (line, user_id, date, check_in, check_out, error)
+    SELECT line, uid, day, cin, cout,
+           CASE
+               WHEN NOT uid_ok THEN 'invalid user_id'
+               WHEN NOT date_ok THEN 'invalid date'
+               WHEN NOT cin_ok OR NOT cout_ok THEN 'invalid time'
+               WHEN cin IS NULL AND cout IS NULL THEN 'no check-in or check-out time'
+               WHEN NOT EXISTS (SELECT 1 FROM users u WHERE u.id = uid) THEN 'unknown user'
+               WHEN cout < cin THEN 'check-out before check-in'
+           END
+    FROM (
+        SELECT line, uid_ok, date_ok, cin_ok, cout_ok,
+               CASE WHEN uid_ok THEN user_id::int END AS uid,
+               CASE WHEN date_ok THEN date::date END AS day,
+               CASE WHEN cin_ok THEN check_in::time END AS cin,
+               CASE WHEN cout_ok THEN check_out::time END AS cout
+        FROM (
+            SELECT line, user_id, date, check_in, check_out,
+                   COALESCE(pg_input_is_valid(user_id, 'integer'), FALSE) AS uid_ok,
+                   COALESCE(pg_input_is_valid(date, 'date'), FALSE) AS date_ok,
+                   COALESCE(pg_input_is_valid(check_in, 'time'), TRUE) AS cin_ok,
+                   COALESCE(pg_input_is_valid(check_out, 'time'), TRUE) AS cout_ok
+            FROM (
+                SELECT line, btrim(user_id) AS user_id, btrim(date) AS date,
+                       NULLIF(btrim(check_in), '') AS check_in, NULLIF(btrim(check_out), '') AS check_out
+                FROM attendance_import_raw
+            ) trimmed
+        ) checked
+    ) typed
+"""
+
+# Rows can each be in order and still fold into a day that is not, e.g. one
+# punch with only 17:00 in and another with only 09:00 out
+FOLDED_ORDER_SQL = """
+    UPDATE attendance_import_rows r SET error = 'check-out before check-in'
+    FROM (
+        SELECT user_id, date FROM attendance_import_rows
+        WHERE error IS NULL
+        GROUP BY user_id, date
+        HAVING MAX(check_out) < MIN(check_in)
+    ) bad
+    WHERE r.error IS NULL AND r.user_id = bad.user_id AND r.date = bad.date
+"""
+
+# Late/early use the same integer seconds-of-day rule as utils.shift_policy
+MERGE_SQL = f"""
+    WITH punches AS (
+        SELECT user_id, date, MIN(check_in) AS check_in, MAX(check_out) AS check_out
+        FROM attendance_import_rows
+        WHERE error IS NULL
+        GROUP BY user_id, date
+    ), policies AS (
+        SELECT * FROM unnest(%(batches)s::text[], %(late_after)s::int[], %(early_before)s::int[])
+            AS p (batch, late_after, early_before)
+    ), computed AS (
+        SELECT pu.user_id, pu.date, pu.check_in, pu.check_out,
+               floor(EXTRACT(EPOCH FROM pu.check_in))::int AS cin,
+               floor(EXTRACT(EPOCH FROM pu.check_out))::int AS cout,
+               COALESCE(p.late_after, d.late_after) AS late_after,
+               COALESCE(p.early_before, d.early_before) AS early_before
+        FROM punches pu
+        JOIN users u ON u.id = pu.user_id
+        LEFT JOIN policies p ON p.batch = u.batch
+        CROSS JOIN (SELECT late_after, early_before FROM policies WHERE batch = %(default)s) d
+    ), existing AS (
+        -- Sees attendance as it was before the merge (xmax can't be returned from a partitioned table)
+        SELECT a.user_id, a.date FROM punches pu
+        JOIN attendance a ON a.user_id = pu.user_id AND a.date = pu.date
+    ), merged AS (
+        INSERT INTO attendance AS a (
+            user_id, date, check_in, check_out, late_minutes, early_minutes, is_present,
+            checkin_time, checkout_time, is_late, is_early_leave
+        )
+        SELECT user_id, date, check_in, check_out,
+               -- GREATEST skips NULLs; a missing time must stay NULL so the
+               -- ON CONFLICT branch keeps the stored minutes
+               CASE WHEN cin IS NULL THEN NULL ELSE GREATEST(0, cin - late_after) / 60 END,
+               CASE WHEN cout IS NULL THEN NULL ELSE GREATEST(0, early_before - cout) / 60 END,
+               TRUE,
+               check_in, check_out, cin > late_after, cout < early_before
+        FROM computed
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            check_in = COALESCE(EXCLUDED.check_in, a.check_in),
+            late_minutes = COALESCE(EXCLUDED.late_minutes, a.late_minutes),
+            checkin_time = COALESCE(EXCLUDED.checkin_time, a.checkin_time),
+            is_late = COALESCE(EXCLUDED.is_late, a.is_late),
+            check_out = COALESCE(EXCLUDED.check_out, a.check_out),
+            early_minutes = COALESCE(EXCLUDED.early_minutes, a.early_minutes),
+            checkout_time = COALESCE(EXCLUDED.checkout_time, a.checkout_time),
+            is_early_leave = COALESCE(EXCLUDED.is_early_leave, a.is_early_leave),
+            is_present = TRUE
+        WHERE (a.check_in, a.check_out, a.checkin_time, a.checkout_time, a.is_present)
+              IS DISTINCT FROM (
+                  COALESCE(EXCLUDED.check_in, a.check_in), COALESCE(EXCLUDED.check_out, a.check_out),
+                  COALESCE(EXCLUDED.checkin_time, a.checkin_time),
+                  COALESCE(EXCLUDED.checkout_time, a.checkout_time), TRUE
+              )
+        RETURNING a.user_id, a.date
+    ), {bump_cte("merged", "attendance_version")}
+    SELECT (SELECT COUNT(*) FROM punches),
+           COUNT(*) FILTER (WHERE e.user_id IS NULL),
+           COUNT(*) FILTER (WHERE e.user_id IS NOT NULL),
+           COALESCE(array_agg(DISTINCT date_trunc('month', m.date)::date), '{{}}')
+    FROM merged m
+    LEFT JOIN existing e ON e.user_id = m.user_id AND e.date = m.date
+"""
+
+SUMMARY_SQL = """
+    SELECT COALESCE(SUM(n), 0)::int,
+           COALESCE(SUM(n) FILTER (WHERE error IS NULL), 0)::int,
+           COALESCE(jsonb_object_agg(error, n) FILTER (WHERE error IS NOT NULL), '{}')
+    FROM (
+        SELECT error, COUNT(*) AS n FROM attendance_import_rows GROUP BY error
+    ) counts
+"""
+
+
+# Import a CSV file object (bytes or text). Returns the counts; raises ValueError
+# if the file is not CSV with the four expected columns, ImportUnsupported if the
+# server is older than PostgreSQL 16.
+def import_csv(file, header=True):
+    start = time.perf_counter()
+    compiled = shift_policy.compiled_policies()
+    policy_params = {
+        "batches": list(compiled),
+        "late_after": [t[0] for t in compiled.values()],
+        "early_before": [t[1] for t in compiled.values()],
+        "default": shift_policy.DEFAULT_BATCH,
+    }
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SHOW server_version_num")
+        version = int(cursor.fetchone()[0])
+        if version < MIN_SERVER_VERSION:
+            raise ImportUnsupported(f"Attendance import needs PostgreSQL 16 or later "
+                                    f"(server is {version // 10000}.{version % 10000})")
+        cursor.execute(CREATE_STAGING_SQL)
+        try:
+            cursor.copy_expert(COPY_SQL.format(header="true" if header else "false"), file)
+        except psycopg2.DataError as e:
+            conn.rollback()
+            raise ValueError(f"Malformed CSV: {e.diag.message_primary}") from None
+        cursor.execute(VALIDATE_SQL)
+        cursor.execute(FOLDED_ORDER_SQL)
+
+        cursor.execute(SUMMARY_SQL)
+        rows, valid, rejected_by_reason = cursor.fetchone()
+        cursor.execute("""
+            SELECT line, error FROM attendance_import_rows
+            WHERE error IS NOT NULL ORDER BY line LIMIT %s
+        """, (IMPORT_MAX_ERRORS,))
+        errors = [{"row": line, "error": error} for line, error in cursor.fetchall()]
+
+        cursor.execute(MERGE_SQL, policy_params)
+        days, inserted, updated, months = cursor.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+    for month in months:
+        attendance_summary.rebuild(month.year, month.month)
+
+    return {
+        "rows": rows,
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": days - inserted - updated,
+        "duplicates": valid - days,
+        "rejected": rows - valid,
+        "rejected_by_reason": rejected_by_reason,
+        "errors": errors,
+        "months": [f"{m.year}-{m.month:02d}" for m in sorted(months)],
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
@@ -0,0 +1,150 @@
+# attendance_partitions.py
+#
+# attendance is range-partitioned by month on `date` (migrations/0007): one
+# attendance_YYYY_MM table per month plus attendance_default, which catches
+# rows for months that have no partition yet. Queries that filter on date
+# (check-in / check-out, month reads, re-evaluation) are pruned by the planner
+# to the partitions they need, so today's lookups touch only this month's table
+# however much history there is.
+#
+#   ensure_partitions()  creates this month and ATTENDANCE_PARTITIONS_AHEAD more;
+#                        months already sitting in attendance_default are moved
+#                        into their own partition. Run at worker start-up and
+#                        from cron (`flask ensure-attendance-partitions`).
+#   archive_year(year)   detaches a closed year's partitions and moves them to
+#                        the ARCHIVE_SCHEMA schema; they stay queryable there
+#                        but drop out of attendance and its indexes.
+
+import os
+from datetime import date
+
+import psycopg2.extras
+
+from db import get_connection
+
+ATTENDANCE_PARTITIONS_AHEAD = int(os.getenv("ATTENDANCE_PARTITIONS_AHEAD", "3"))
+ARCHIVE_SCHEMA = os.getenv("ATTENDANCE_ARCHIVE_SCHEMA", "archive")
+# Serialises partition DDL between workers starting at the same time
+LOCK_KEY = 7_254_002
+
+DEFAULT_PARTITION = "attendance_default"
+
+LIST_SQL = """
+    SELECT c.relname AS name,
+           pg_get_expr(c.relpartbound, c.oid) AS bound,
+           GREATEST(c.reltuples, 0)::bigint AS approx_rows,
+           pg_total_relation_size(c.oid) AS bytes
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'attendance'::regclass
+    ORDER BY c.relname
+"""
+
+
+def partition_name(year, month):
+    return f"attendance_{year:04d}_{month:02d}"
+
+
+def _add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def list_partitions():
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute(LIST_SQL)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def _existing(cursor):
+    cursor.execute("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                   "WHERE i.inhparent = 'attendance'::regclass")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _default_months(cursor):
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', date)::date FROM {DEFAULT_PARTITION} ORDER BY 1")
+    return [row[0] for row in cursor.fetchall()]
+
+
+# Create the partition for the month starting at `first`. A new month can't be
+# added while attendance_default holds rows for it, so those rows are moved into
+# a plain table first and the table is attached afterwards.
+def _create_partition(cursor, first, has_default_rows):
+    name = partition_name(first.year, first.month)
+    bounds = (first, _add_months(first, 1))
+    if not has_default_rows:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF attendance FOR VALUES FROM (%s) TO (%s)", bounds)
+        return
+    cursor.execute(f"CREATE TABLE {name} (LIKE attendance INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, bounds)
+    cursor.execute(f"ALTER TABLE attendance ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+
+
+def _ensure(cursor, months):
+    existing = _existing(cursor)
+    in_default = set(_default_months(cursor))
+    created = []
+    for first in sorted(set(months) | in_default):
+        if partition_name(first.year, first.month) in existing:
+            continue
+        _create_partition(cursor, first, first in in_default)
+        created.append(partition_name(first.year, first.month))
+    return created
+
+
+# Make sure partitions exist from the current month through `ahead` months after
+# it, and give every month found in attendance_default its own partition.
+# Returns the names of the partitions created.
+def ensure_partitions(ahead=None):
+    ahead = ATTENDANCE_PARTITIONS_AHEAD if ahead is None else ahead
+    this_month = date.today().replace(day=1)
+    months = [_add_months(this_month, n) for n in range(ahead + 1)]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+        created = _ensure(cursor, months)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return created
+
+
+# Detach every partition of a closed year and move it to ARCHIVE_SCHEMA.
+# Raises ValueError for the current or a future year. Returns the archived names.
+def archive_year(year):
+    if year >= date.today().year:
+        raise ValueError(f"{year} is not closed yet")
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+        # Rows for the year still in attendance_default go to their month first
+        _ensure(cursor, [])
+        names = [partition_name(year, month) for month in range(1, 13)]
+        archived = sorted(_existing(cursor) & set(names))
+        for name in archived:
+            cursor.execute(f"ALTER TABLE attendance DETACH PARTITION {name}")
+            cursor.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return archived
@@ -0,0 +1,192 @@
+# cache.py
+#
+# Read-through cache for user / staff directory lookups.
+#   tier 1: in-process LRU (per gunicorn worker), short TTL
+#   tier 2: SQLite file shared by all workers on the machine, longer TTL
+# Writes to staff (add-staff / register) call invalidate() which clears this
+# worker's LRU and the shared tier; other workers' LRUs age out within
+# CACHE_LOCAL_TTL seconds.
+#
+# The shared file lives in CACHE_DIR, a directory only this user may enter, and
+# holds JSON, so nothing read back from it can run code. Values that don't
+# survive JSON (Decimal, dates) stay in the local tier only; loaders should
+# return plain types. Password hashes are never cached (models/user_model.py).
+
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", "5"))
+CACHE_LOCAL_MAX = int(os.getenv("CACHE_LOCAL_MAX", "1024"))
+CACHE_SHARED_MAX = int(os.getenv("CACHE_SHARED_MAX", "10000"))
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), f"attendance-cache-{os.getuid()}"))
+
+# Errors that disable the shared tier for one call instead of failing the request
+SHARED_ERRORS = (sqlite3.Error, OSError, TypeError, ValueError)
+
+
+class LocalLRU:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Create CACHE_DIR as 0700, or check that an existing one is ours, is not a
+# symlink and is closed to everyone else. Raises OSError otherwise.
+def _private_dir(path):
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not os.path.isdir(path) or os.path.islink(path) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"Cache directory {path} must be a private directory owned by this user")
+    return path
+
+
+class SharedStore:
+    def __init__(self, directory, maxsize, ttl):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            path = os.path.join(_private_dir(self.directory), "cache.sqlite3")
+            conn = sqlite3.connect(path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL
+                )
+            """)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        row = self._conn().execute("SELECT value, expires, accessed FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < now:
+            return None
+        # Approximate LRU: only touch the access time once a second
+        if now - row[2] > 1:
+            self._conn().execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return (True, json.loads(row[0]))
+
+    def set(self, key, value):
+        now = time.time()
+        data = json.dumps(value, separators=(",", ":"))
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+            (key, data, now + self.ttl, now),
+        )
+        if conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] > self.maxsize:
+            conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+            conn.execute("""
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY accessed LIMIT max(0, (SELECT COUNT(*) FROM cache) - ?)
+                )
+            """, (self.maxsize,))
+
+    def delete_prefix(self, prefix):
+        self._conn().execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+
+class TwoTierCache:
+    def __init__(self):
+        self.local = LocalLRU(CACHE_LOCAL_MAX, CACHE_LOCAL_TTL)
+        self.shared = SharedStore(CACHE_DIR, CACHE_SHARED_MAX, CACHE_TTL)
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0, "shared_errors": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # Return the cached value for key, or call loader() and cache its result.
+    # None results (e.g. user not found) are not cached.
+    def get_or_load(self, key, loader):
+        entry = self.local.get(key)
+        if entry is not None:
+            self._count("local_hits")
+            return entry[1]
+
+        try:
+            found = self.shared.get(key)
+        except SHARED_ERRORS:
+            self._count("shared_errors")
+            found = None
+        if found is not None:
+            self._count("shared_hits")
+            self.local.set(key, found[1])
+            return found[1]
+
+        self._count("misses")
+        value = loader()
+        if value is not None:
+            self.local.set(key, value)
+            try:
+                self.shared.set(key, value)
+            except SHARED_ERRORS:
+                self._count("shared_errors")
+        return value
+
+    def invalidate(self, *namespaces):
+        for ns in namespaces:
+            prefix = ns + ":"
+            self.local.delete_prefix(prefix)
+            try:
+                self.shared.delete_prefix(prefix)
+            except SHARED_ERRORS:
+                self._count("shared_errors")
+        self._count("invalidations")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pid"] = os.getpid()
+        stats["local_size"] = len(self.local)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["local_hits"] + stats["shared_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+cache = TwoTierCache()
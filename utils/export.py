@@ -0,0 +1,64 @@
+# export.py
+#
+# Streaming NDJSON / CSV exports. Rows come from a server-side (named) cursor in
+# batches of EXPORT_ITERSIZE and are written to the response as they arrive, so
+# memory stays flat no matter how large the result is.
+
+from db import get_connection
+from flask import Response, stream_with_context
+from utils.json_provider import dumps_bytes
+import csv
+import io
+import os
+import uuid
+
+EXPORT_ITERSIZE = int(os.getenv("EXPORT_ITERSIZE", "2000"))
+# ?itersize= is clamped to 1..EXPORT_MAX_ITERSIZE so a caller can't make one
+# batch hold the whole table in memory
+EXPORT_MAX_ITERSIZE = EXPORT_ITERSIZE * 10
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+# Export format requested via ?format=ndjson|csv, or None for the normal JSON response
+def export_format(args):
+    fmt = (args.get("format") or "").lower()
+    return fmt if fmt in FORMATS else None
+
+
+def _ndjson_chunk(columns, rows):
+    return b"".join(dumps_bytes(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def _csv_chunk(rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
+
+def stream_query(sql, params, fmt, filename="export", itersize=None):
+    itersize = min(max(itersize or EXPORT_ITERSIZE, 1), EXPORT_MAX_ITERSIZE)
+
+    def generate():
+        conn = get_connection()
+        try:
+            cursor = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+            cursor.itersize = itersize
+            cursor.execute(sql, params)
+            rows = cursor.fetchmany(itersize)
+            columns = [col.name for col in cursor.description] if cursor.description else []
+            if fmt == "csv":
+                yield _csv_chunk([columns])
+            while rows:
+                yield _csv_chunk(rows) if fmt == "csv" else _ndjson_chunk(columns, rows)
+                rows = cursor.fetchmany(itersize)
+            cursor.close()
+        finally:
+            conn.close()
+
+    response = Response(stream_with_context(generate()), mimetype=FORMATS[fmt])
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}.{fmt}"
+    return response
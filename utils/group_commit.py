@@ -0,0 +1,179 @@
+# group_commit.py
+#
+# Opt-in group commit for check-in bursts (CHECKIN_GROUP_COMMIT=1). Concurrent
+# check-ins in a worker are queued and a background thread writes them as one
+# multi-row insert + one commit every CHECKIN_FLUSH_MS (or as soon as
+# CHECKIN_MAX_BATCH are waiting). Each caller blocks until its own row is
+# committed and gets its own result or error back.
+#
+# Batches only form when one worker handles several check-ins at once, i.e. under
+# threaded or async serving (the gthread workers from gunicorn.conf.py, or
+# asgi.py). Under sync workers (-k sync) every batch holds one row and each
+# check-in just pays the flush delay, so leave it off there.
+#
+# A caller that gives up after CHECKIN_WAIT_TIMEOUT gets CheckInPending: its row
+# may still be committed by the batch, so the outcome is unknown, not failed.
+
+from db import get_connection
+from models.attendance_model import insert_check_in, insert_check_ins
+import os
+import threading
+import psycopg2
+
+GROUP_COMMIT = os.getenv("CHECKIN_GROUP_COMMIT", "0") == "1"
+FLUSH_INTERVAL = float(os.getenv("CHECKIN_FLUSH_MS", "5")) / 1000
+MAX_BATCH = int(os.getenv("CHECKIN_MAX_BATCH", "200"))
+WAIT_TIMEOUT = float(os.getenv("CHECKIN_WAIT_TIMEOUT", "10"))
+
+
+class CheckInPending(Exception):
+    pass
+
+
+class _Pending:
+    __slots__ = ("user_id", "day", "columns", "values", "done", "inserted", "error")
+
+    def __init__(self, user_id, day, values):
+        self.user_id = user_id
+        self.day = day
+        self.columns = tuple(values)
+        self.values = tuple(values.values())
+        self.done = threading.Event()
+        self.inserted = False
+        self.error = None
+
+
+class CheckInBatcher:
+    def __init__(self):
+        self._queue = []
+        self._cond = threading.Condition()
+        self._stats = {"batches": 0, "rows": 0, "fallbacks": 0}
+        self._thread = threading.Thread(target=self._run, name="checkin-group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, day, values):
+        item = _Pending(user_id, day, values)
+        with self._cond:
+            self._queue.append(item)
+            if len(self._queue) == 1 or len(self._queue) >= MAX_BATCH:
+                self._cond.notify()
+        if not item.done.wait(WAIT_TIMEOUT):
+            raise CheckInPending("Check-in was queued but not confirmed in time")
+        if item.error is not None:
+            raise item.error
+        return item.inserted
+
+    def _take(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Give the burst one flush interval to fill the batch
+            if len(self._queue) < MAX_BATCH:
+                self._cond.wait(FLUSH_INTERVAL)
+            batch = self._queue[:MAX_BATCH]
+            del self._queue[:MAX_BATCH]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            try:
+                self._flush(batch)
+            except Exception as e:
+                for item in batch:
+                    if not item.done.is_set():
+                        item.error = e
+                        item.done.set()
+
+    def _flush(self, batch):
+        # First request for a (user, day) wins; later ones in the same batch are duplicates
+        first = {}
+        for item in batch:
+            first.setdefault((item.user_id, item.day), item)
+
+        groups = {}
+        for item in first.values():
+            groups.setdefault(item.columns, []).append(item)
+
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            try:
+                inserted = set()
+                for columns, items in groups.items():
+                    rows = [(item.user_id, item.day, *item.values) for item in items]
+                    inserted |= insert_check_ins(cursor, columns, rows)
+                conn.commit()
+            except psycopg2.Error:
+                # One bad row (e.g. unknown user) must not fail its neighbours: retry row by row
+                conn.rollback()
+                with self._cond:
+                    self._stats["fallbacks"] += 1
+                inserted = self._flush_each(conn, first.values())
+        finally:
+            conn.close()
+
+        with self._cond:
+            self._stats["batches"] += 1
+            self._stats["rows"] += len(batch)
+        for item in batch:
+            owner = first[(item.user_id, item.day)]
+            if owner.error is not None:
+                item.error = owner.error
+            else:
+                item.inserted = owner is item and (item.user_id, item.day) in inserted
+            item.done.set()
+
+    def _flush_each(self, conn, items):
+        inserted = set()
+        cursor = conn.cursor()
+        for item in items:
+            cursor.execute("SAVEPOINT checkin")
+            try:
+                if insert_check_in(cursor, item.user_id, item.day, dict(zip(item.columns, item.values))):
+                    inserted.add((item.user_id, item.day))
+                cursor.execute("RELEASE SAVEPOINT checkin")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT checkin")
+                item.error = e
+        conn.commit()
+        return inserted
+
+    def stats(self):
+        with self._cond:
+            return {**self._stats, "queued": len(self._queue)}
+
+
+_batcher = None
+_batcher_pid = None
+_lock = threading.Lock()
+
+
+def _get_batcher():
+    global _batcher, _batcher_pid
+    pid = os.getpid()
+    if _batcher is None or _batcher_pid != pid:
+        with _lock:
+            if _batcher is None or _batcher_pid != pid:
+                _batcher = CheckInBatcher()
+                _batcher_pid = pid
+    return _batcher
+
+
+# Check in through the group-commit buffer when enabled, otherwise in its own transaction.
+# Returns True if the row was inserted, False if the user had already checked in.
+def check_in(user_id, day, values):
+    if GROUP_COMMIT:
+        return _get_batcher().submit(user_id, day, values)
+    conn = get_connection()
+    cursor = conn.cursor()
+    inserted = insert_check_in(cursor, user_id, day, values)
+    conn.commit()
+    conn.close()
+    return inserted
+
+
+def group_commit_stats():
+    if not GROUP_COMMIT:
+        return {"enabled": False}
+    return {"enabled": True, **_get_batcher().stats()}
@@ -0,0 +1,58 @@
+# json_provider.py
+#
+# App-wide JSON encoding. orjson serializes lists of DB rows in C, with dates
+# and times as ISO 8601 and Decimal as float, so handlers can return cursor rows
+# as-is instead of formatting every field in Python; compact records from
+# utils.rows.RecordCursor encode as objects. Without orjson installed the stdlib
+# encoder is used with the same conventions.
+
+from datetime import date, time
+from decimal import Decimal
+import json
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def json_default(value):
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps_bytes(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=ORJSON_OPTIONS)
+    # The stdlib encoder writes tuples (records) as arrays without asking json_default
+    if isinstance(obj, list) and obj and hasattr(obj[0], "_asdict"):
+        obj = [row._asdict() for row in obj]
+    elif hasattr(obj, "_asdict"):
+        obj = obj._asdict()
+    return json.dumps(obj, default=json_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class FastJSONProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault("default", json_default)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype="application/json")
@@ -0,0 +1,80 @@
+from db import request_db_stats
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, REGISTRY
+from prometheus_client import multiprocess
+import os
+import time
+
+# Prometheus metrics for every Flask route (app.py and the blueprints), served
+# on /metrics. Under gunicorn each worker writes to PROMETHEUS_MULTIPROC_DIR
+# (set up by gunicorn.conf.py) and /metrics merges all workers, so whichever
+# worker answers the scrape reports the totals for the whole server.
+#
+# Routes are labelled by their URL rule ("/api/user-attendance/<int:user_id>"),
+# never the raw path, to keep label cardinality bounded.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+ACQUIRE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+LATENCY = Histogram("http_request_duration_seconds", "Request latency", ["method", "route"],
+                    buckets=LATENCY_BUCKETS)
+DB_QUERIES = Histogram("db_queries_per_request", "SQL statements executed per request", ["route"],
+                       buckets=QUERY_BUCKETS)
+DB_TIME = Histogram("db_time_per_request_seconds", "Time spent in the database per request", ["route"],
+                    buckets=LATENCY_BUCKETS)
+DB_ROWS = Histogram("db_rows_fetched_per_request", "Rows fetched per request", ["route"],
+                    buckets=ROW_BUCKETS)
+DB_ACQUIRE = Histogram("db_pool_acquire_seconds_per_request", "Time waiting for pooled connections per request",
+                       ["route"], buckets=ACQUIRE_BUCKETS)
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def _start():
+    g._metrics_start = time.perf_counter()
+    request_db_stats()
+
+
+def _finish(response):
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return response
+    labels = (request.method, _route(), str(response.status_code))
+    stats = request_db_stats()
+    # Streamed exports do their queries after this hook, so wait for the body to finish
+    if response.is_streamed:
+        response.call_on_close(lambda: _observe(labels, start, stats))
+    else:
+        _observe(labels, start, stats)
+    return response
+
+
+def _observe(labels, start, stats):
+    method, route, status = labels
+    REQUESTS.labels(method, route, status).inc()
+    LATENCY.labels(method, route).observe(time.perf_counter() - start)
+    DB_QUERIES.labels(route).observe(stats["queries"])
+    DB_TIME.labels(route).observe(stats["db_time"])
+    DB_ROWS.labels(route).observe(stats["rows"])
+    if stats["acquires"]:
+        DB_ACQUIRE.labels(route).observe(stats["acquire_time"])
+
+
+def metrics():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.add_url_rule("/metrics", "metrics", metrics)
@@ -0,0 +1,190 @@
+import json
+import os
+import re
+from db import get_connection
+
+# Versioned schema migrations. Each step is a pair of plain SQL files in
+# migrations/: NNNN_name.up.sql and NNNN_name.down.sql. Applied versions are
+# recorded in schema_migrations; every step runs in its own transaction, and a
+# session advisory lock keeps two deploys from migrating at the same time.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+LOCK_KEY = 7_254_001
+
+FILE_RE = re.compile(r"^(\d{4})_(\w+)\.(up|down)\.sql$")
+
+# Steps whose rollback would destroy data that predates migrations (0001 adopts
+# hand-made production tables)
+IRREVERSIBLE = ("0001",)
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+"""
+
+# Hot-path queries and the table each one must reach through an index.
+# Parameters are sample values; only the plan shape matters.
+HOT_QUERIES = [
+    ("check-in lookup", "attendance",
+     "SELECT id FROM attendance WHERE user_id = %s AND date = %s", (1, "2025-01-01")),
+    ("check-out", "attendance",
+     "UPDATE attendance SET checkout_time = '18:00' WHERE user_id = %s AND date = %s AND checkout_time IS NULL",
+     (1, "2025-01-01")),
+    ("attendance history", "attendance",
+     "SELECT date, checkin_time, checkout_time FROM attendance WHERE user_id = %s ORDER BY date DESC LIMIT 31", (1,)),
+    ("login", "users",
+     "SELECT * FROM users WHERE email = %s", ("someone@example.com",)),
+    ("staff list", "users",
+     "SELECT id, name, email FROM users WHERE role = 'user' ORDER BY id", ()),
+    ("latest salary log", "salary_logs",
+     "SELECT * FROM salary_logs WHERE user_id = %s ORDER BY year DESC, month DESC LIMIT 1", (1,)),
+    ("latest salary", "salary",
+     "SELECT * FROM salary WHERE user_id = %s ORDER BY year DESC, month DESC LIMIT 1", (1,)),
+    ("salary report", "salary_logs",
+     "SELECT * FROM salary_logs WHERE year = %s AND month = %s", (2025, 1)),
+]
+
+# Bitmap Index Scan nodes carry no relation name; their parent Bitmap Heap Scan does
+INDEX_NODES = ("Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+
+# Single-day queries that partition pruning must narrow to one attendance partition
+SINGLE_PARTITION_QUERIES = ("check-in lookup", "check-out")
+
+PARTITIONS_SQL = """
+    SELECT c.relname, p.relname FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+"""
+
+
+def discover():
+    steps = {}
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = FILE_RE.match(filename)
+        if not match:
+            continue
+        version, name, direction = match.groups()
+        step = steps.setdefault(version, {"version": version, "name": name})
+        step[direction] = os.path.join(MIGRATIONS_DIR, filename)
+    for step in steps.values():
+        if "up" not in step or "down" not in step:
+            raise RuntimeError(f"Migration {step['version']}_{step['name']} needs both .up.sql and .down.sql")
+    return [steps[v] for v in sorted(steps)]
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _applied(cursor):
+    cursor.execute(CREATE_TABLE_SQL)
+    cursor.execute("SELECT version, applied_at FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+
+# Run fn(conn, applied) while holding the migration lock
+def _locked(fn):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+        applied = _applied(cursor)
+        conn.commit()
+        return fn(conn, applied)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        conn.commit()
+        conn.close()
+
+
+def status():
+    def run(conn, applied):
+        return [(s["version"], s["name"], applied.get(s["version"])) for s in discover()]
+    return _locked(run)
+
+
+# Apply pending steps in order, up to and including `target` (default: all)
+def upgrade(target=None):
+    def run(conn, applied):
+        done = []
+        cursor = conn.cursor()
+        for step in discover():
+            if target is not None and step["version"] > target:
+                break
+            if step["version"] in applied:
+                continue
+            cursor.execute(_read(step["up"]))
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                           (step["version"], step["name"]))
+            conn.commit()
+            done.append(f"{step['version']}_{step['name']}")
+        return done
+    return _locked(run)
+
+
+class IrreversibleMigration(Exception):
+    pass
+
+
+# Undo the last `steps` applied migrations, newest first. Raises
+# IrreversibleMigration, before undoing anything, if that would reach an
+# IRREVERSIBLE step.
+def rollback(steps=1):
+    def run(conn, applied):
+        plan = [step for step in reversed(discover()) if step["version"] in applied][:steps]
+        for step in plan:
+            if step["version"] in IRREVERSIBLE:
+                raise IrreversibleMigration(f"{step['version']}_{step['name']} cannot be rolled back")
+        done = []
+        cursor = conn.cursor()
+        for step in plan:
+            cursor.execute(_read(step["down"]))
+            cursor.execute("DELETE FROM schema_migrations WHERE version = %s", (step["version"],))
+            conn.commit()
+            done.append(f"{step['version']}_{step['name']}")
+        return done
+    return _locked(run)
+
+
+def _scans(plan):
+    yield plan["Node Type"], plan.get("Relation Name")
+    for child in plan.get("Plans", []):
+        yield from _scans(child)
+
+
+# EXPLAIN every hot query with sequential scans disabled and report whether
+# the planner can reach its table through an index. Scans of a partition count
+# for its parent table. Returns (name, ok, nodes).
+def verify_indexes():
+    conn = get_connection()
+    cursor = conn.cursor()
+    results = []
+    try:
+        cursor.execute(PARTITIONS_SQL)
+        parents = dict(cursor.fetchall())
+        for name, table, sql, params in HOT_QUERIES:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = [(node, rel) for node, rel in _scans(plan[0]["Plan"]) if rel]
+            tables = [parents.get(rel, rel) for _, rel in nodes]
+            ok = any(node in INDEX_NODES and rel == table for (node, _), rel in zip(nodes, tables)) and \
+                not any(node == "Seq Scan" and rel == table for (node, _), rel in zip(nodes, tables))
+            if name in SINGLE_PARTITION_QUERIES:
+                scanned = {rel for (node, rel), parent in zip(nodes, tables) if parent == table and "Scan" in node}
+                ok = ok and len(scanned) == 1
+            results.append((name, ok, nodes))
+            conn.rollback()
+    finally:
+        conn.rollback()
+        conn.close()
+    return results
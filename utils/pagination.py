@@ -0,0 +1,71 @@
+# pagination.py
+#
+# Keyset (cursor) pagination for attendance history, keyed on date.
+# Each page is "WHERE date < cursor ORDER BY date DESC LIMIT n", so every page costs
+# the same no matter how much history a user has. Requests without any paging
+# parameter still get the whole history in one response, as before pagination
+# existed; clients opt in by sending limit / before / from / to. The cursor header
+# is listed in the CORS expose_headers so browser clients can read it.
+
+from datetime import date
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a date in YYYY-MM-DD format")
+
+
+PAGING_PARAMS = ("limit", "before", "from", "to")
+
+
+# Read limit / before / from / to from the query string; raises ValueError on bad input.
+# limit is None (no limit) when none of them is given.
+def history_args(args):
+    paged = any(args.get(name) for name in PAGING_PARAMS)
+    try:
+        limit = max(1, min(int(args.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)) if paged else None
+    except ValueError:
+        raise ValueError("'limit' must be an integer")
+    return {
+        "limit": limit,
+        "before": _parse_date(args.get("before"), "before"),
+        "start": _parse_date(args.get("from"), "from"),
+        "end": _parse_date(args.get("to"), "to"),
+    }
+
+
+# Extra WHERE conditions + params for a history page
+def history_filter(before=None, start=None, end=None):
+    sql = ""
+    params = []
+    if before is not None:
+        sql += " AND date < %s"
+        params.append(before)
+    if start is not None:
+        sql += " AND date >= %s"
+        params.append(start)
+    if end is not None:
+        sql += " AND date <= %s"
+        params.append(end)
+    return sql, params
+
+
+# Value for the LIMIT placeholder: one extra row tells us there is a next page
+# (NULL, i.e. no limit, for unpaged requests)
+def fetch_limit(limit):
+    return None if limit is None else limit + 1
+
+
+def split_page(rows, limit, date_of):
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, date_of(rows[-1]).isoformat()
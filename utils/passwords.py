@@ -0,0 +1,150 @@
+# passwords.py
+#
+# bcrypt runs in a small process pool so a login storm burns CPU outside the
+# request workers (and outside the GIL). At most LOGIN_MAX_INFLIGHT checks may be
+# queued or running per worker; beyond that logins are rejected immediately
+# instead of piling up behind each other and starving check-in traffic.
+#
+# The caller's thread still waits for its result, so this only pays off with
+# several request threads per worker: gunicorn.conf.py runs gthread workers with
+# GUNICORN_THREADS threads, and LOGIN_MAX_INFLIGHT stays below that so some
+# threads are always left for other requests.
+#
+# Bulk onboarding hashes through a second pool of PASSWORD_HASH_WORKERS, created
+# on the first batch, so hundreds of hashes do not queue ahead of logins. A single
+# password (add-staff, register) is hashed inline: one hash is not worth
+# starting processes for.
+
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import secrets
+import string
+import threading
+import bcrypt
+
+LOGIN_WORKERS = int(os.getenv("LOGIN_WORKERS", "2"))
+LOGIN_MAX_INFLIGHT = int(os.getenv("LOGIN_MAX_INFLIGHT", "4"))
+LOGIN_TIMEOUT = float(os.getenv("LOGIN_TIMEOUT", "5"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_ROUNDS = int(os.getenv("PASSWORD_ROUNDS", "12"))
+PASSWORD_ALPHABET = string.ascii_letters + string.digits
+
+
+class PasswordCheckBusy(Exception):
+    pass
+
+
+_executors = {}
+_lock = threading.Lock()
+_inflight = 0
+_stats = {"completed": 0, "rejected": 0, "timeouts": 0}
+
+
+def _checkpw(password, hashed):
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # Stored value is not a bcrypt hash
+        return False
+
+
+def _hashpw(password):
+    return bcrypt.hashpw(password, bcrypt.gensalt(PASSWORD_ROUNDS)).decode()
+
+
+# One pool per name and process; call with _lock held
+def _get_executor(name="login", workers=LOGIN_WORKERS):
+    pid = os.getpid()
+    entry = _executors.get(name)
+    if entry is None or entry[0] != pid:
+        # spawn, not fork: request workers are multi-threaded
+        entry = _executors[name] = (pid, ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")))
+    return entry[1]
+
+
+# A bcrypt process died (e.g. OOM-killed) and took the pool with it: forget it so
+# the next call spawns a new one. Only if nobody has replaced it already.
+def _reset_executor(name, executor):
+    with _lock:
+        entry = _executors.get(name)
+        if entry is not None and entry[1] is executor:
+            del _executors[name]
+    executor.shutdown(wait=False)
+
+
+def _done(future):
+    global _inflight
+    with _lock:
+        _inflight -= 1
+        _stats["completed"] += 1
+
+
+def check_password(password, hashed):
+    global _inflight
+    if not password or not hashed:
+        return False
+    with _lock:
+        if _inflight >= LOGIN_MAX_INFLIGHT:
+            _stats["rejected"] += 1
+            raise PasswordCheckBusy("Too many logins in progress")
+        _inflight += 1
+        executor = _get_executor()
+
+    try:
+        future = executor.submit(_checkpw, password.encode(), hashed.encode())
+    except Exception as e:
+        with _lock:
+            _inflight -= 1
+        if isinstance(e, BrokenProcessPool):
+            _reset_executor("login", executor)
+            raise PasswordCheckBusy("Login pool restarting") from None
+        raise
+    # The slot is freed when bcrypt actually finishes (or fails), even if the caller gave up waiting
+    future.add_done_callback(_done)
+    try:
+        return future.result(timeout=LOGIN_TIMEOUT)
+    except TimeoutError:
+        with _lock:
+            _stats["timeouts"] += 1
+        raise PasswordCheckBusy("Login check timed out")
+    except BrokenProcessPool:
+        _reset_executor("login", executor)
+        raise PasswordCheckBusy("Login pool restarting") from None
+
+
+def generate_password(length=6):
+    return "".join(secrets.choice(PASSWORD_ALPHABET) for _ in range(length))
+
+
+# bcrypt hashes for a list of passwords, in order, computed across the hashing pool
+def hash_passwords(passwords):
+    if len(passwords) <= 1:
+        return [hash_password(p) for p in passwords]
+    with _lock:
+        executor = _get_executor("hash", PASSWORD_HASH_WORKERS)
+    chunksize = max(1, len(passwords) // (PASSWORD_HASH_WORKERS * 4))
+    try:
+        return list(executor.map(_hashpw, [p.encode() for p in passwords], chunksize=chunksize))
+    except BrokenProcessPool:
+        _reset_executor("hash", executor)
+        raise
+
+
+def hash_password(password):
+    return _hashpw(password.encode())
+
+
+def password_pool_stats():
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "workers": LOGIN_WORKERS,
+            "max_inflight": LOGIN_MAX_INFLIGHT,
+            "inflight": _inflight,
+            "queue_depth": max(0, _inflight - LOGIN_WORKERS),
+            "completed": _stats["completed"],
+            "rejected": _stats["rejected"],
+            "timeouts": _stats["timeouts"],
+        }
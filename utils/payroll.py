@@ -0,0 +1,212 @@
+# payroll.py
+#
+# Shared payroll engine. A month of attendance is loaded as columns and reduced
+# per user with NumPy, so deductions/bonus for every employee are computed in
+# one pass instead of looping over dict rows per user.
+
+from calendar import monthrange
+from datetime import date
+import os
+import numpy as np
+import psycopg2.extras
+from utils.rows import fetch_columns
+
+# "attendance" scans raw rows; "summary" reads the incrementally maintained attendance_monthly
+PAYROLL_SOURCE = os.getenv("PAYROLL_SOURCE", "attendance")
+
+ATTENDANCE_COLUMNS_SQL = """
+    SELECT user_id,
+           COALESCE(is_late, FALSE) OR COALESCE(late_minutes, 0) > 0 AS late,
+           COALESCE(is_early_leave, FALSE) OR COALESCE(early_minutes, 0) > 0 AS early,
+           COALESCE(permission_used::int, 0) <> 0 AS permission,
+           COALESCE(is_paid_leave, FALSE) AS paid_leave
+    FROM attendance
+    WHERE date >= %s AND date < %s
+"""
+
+SUMMARY_COLUMNS_SQL = """
+    SELECT user_id, present_days, late_days, early_days, permission_days, paid_leave_days
+    FROM attendance_monthly
+    WHERE year = %s AND month = %s
+"""
+
+UPSERT_SALARY_SQL = """
+    INSERT INTO salary (
+        user_id, month, year, total_days, total_present,
+        paid_leave, permissions_used, late_deductions, early_deductions,
+        total_deductions, total_additions, final_salary
+    )
+    VALUES %s
+    ON CONFLICT (user_id, month, year) DO UPDATE SET
+        total_days = EXCLUDED.total_days,
+        total_present = EXCLUDED.total_present,
+        paid_leave = EXCLUDED.paid_leave,
+        permissions_used = EXCLUDED.permissions_used,
+        late_deductions = EXCLUDED.late_deductions,
+        early_deductions = EXCLUDED.early_deductions,
+        total_deductions = EXCLUDED.total_deductions,
+        total_additions = EXCLUDED.total_additions,
+        final_salary = EXCLUDED.final_salary
+"""
+
+
+# First day of the month and first day of the next month (half-open range, index friendly)
+def month_range(year, month):
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def days_in(year, month):
+    return monthrange(year, month)[1]
+
+
+def _zero_counts(n):
+    return {key: np.zeros(n, dtype=np.int64) for key in ("present", "late", "early", "permission", "paid_leave")}
+
+
+def _filter_users(sql, params, user_ids):
+    if len(user_ids) == 1:
+        return sql + " AND user_id = %s", params + [int(user_ids[0])]
+    return sql + " AND user_id = ANY(%s)", params + [user_ids.tolist()]
+
+
+# Positions of att_user in the sorted user_ids array, and which rows matched
+def _align(user_ids, att_user):
+    n = len(user_ids)
+    idx = np.searchsorted(user_ids, att_user)
+    keep = (idx < n) & (user_ids[np.minimum(idx, n - 1)] == att_user)
+    return idx[keep], keep
+
+
+# Per-user counts reduced from a month of raw attendance rows
+def load_attendance_counts(cursor, year, month, user_ids):
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    n = len(user_ids)
+    if n == 0:
+        return _zero_counts(0)
+    start_date, end_date = month_range(year, month)
+
+    sql, params = _filter_users(ATTENDANCE_COLUMNS_SQL, [start_date, end_date], user_ids)
+    cursor.execute(sql, params)
+    cols = fetch_columns(cursor)
+    if not len(cols["user_id"]):
+        return _zero_counts(n)
+
+    idx, keep = _align(user_ids, cols["user_id"])
+
+    def count(col):
+        return np.bincount(idx, weights=col[keep], minlength=n).astype(np.int64)
+
+    return {
+        "present": np.bincount(idx, minlength=n).astype(np.int64),
+        "late": count(cols["late"]),
+        "early": count(cols["early"]),
+        "permission": count(cols["permission"]),
+        "paid_leave": count(cols["paid_leave"]),
+    }
+
+
+# Per-user counts read straight from the attendance_monthly summary (one row per user)
+def load_summary_counts(cursor, year, month, user_ids):
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    n = len(user_ids)
+    counts = _zero_counts(n)
+    if n == 0:
+        return counts
+
+    sql, params = _filter_users(SUMMARY_COLUMNS_SQL, [year, month], user_ids)
+    cursor.execute(sql, params)
+    cols = fetch_columns(cursor)
+    if not len(cols["user_id"]):
+        return counts
+
+    idx, keep = _align(user_ids, cols["user_id"])
+    for key, column in (("present", "present_days"), ("late", "late_days"), ("early", "early_days"),
+                        ("permission", "permission_days"), ("paid_leave", "paid_leave_days")):
+        counts[key][idx] = cols[column][keep]
+    return counts
+
+
+# Per-user monthly counts (present, late, early, permission, paid leave)
+# aligned with user_ids, which must be sorted ascending
+def load_month_counts(cursor, year, month, user_ids):
+    if PAYROLL_SOURCE == "summary":
+        return load_summary_counts(cursor, year, month, user_ids)
+    return load_attendance_counts(cursor, year, month, user_ids)
+
+
+# Vectorized salary rules over per-user count arrays.
+# per_day / base_salary may be scalars or arrays aligned with the counts.
+# paid_leave_days / permission_minutes set to None disable that rule.
+def compute_payroll(counts, days_in_month, per_day, base_salary=None,
+                    paid_leave_days=1, permission_minutes=120,
+                    late_cut_percent=20, early_cut_percent=20,
+                    bonus_amount=0, bonus_leave_limit=0):
+    present = counts["present"]
+    paid_leave = counts["paid_leave"]
+    permission = counts["permission"]
+    per_day = np.asarray(per_day, dtype=np.float64)
+
+    if base_salary is None:
+        base = present * per_day
+    else:
+        base = np.broadcast_to(np.asarray(base_salary, dtype=np.float64), present.shape)
+
+    late_deduct = counts["late"] * per_day * (late_cut_percent / 100)
+    early_deduct = counts["early"] * per_day * (early_cut_percent / 100)
+
+    if paid_leave_days is None:
+        unpaid_leave_deduct = np.zeros(present.shape)
+    else:
+        unpaid_leave_deduct = np.maximum(0, paid_leave - paid_leave_days) * per_day
+
+    if permission_minutes is None:
+        permission_deduct = np.zeros(present.shape)
+    else:
+        excess_minutes = np.maximum(0, permission * 60 - permission_minutes)
+        permission_deduct = (excess_minutes / 60) * per_day
+
+    perfect = (present == days_in_month) & (paid_leave <= bonus_leave_limit) & (permission == 0)
+    bonus = np.where(perfect, float(bonus_amount), 0.0)
+
+    total_deductions = late_deduct + early_deduct + unpaid_leave_deduct + permission_deduct
+    return {
+        "present": present,
+        "paid_leave": paid_leave,
+        "permission": permission,
+        "base": base,
+        "late_deductions": late_deduct,
+        "early_deductions": early_deduct,
+        "unpaid_leave_deduct": unpaid_leave_deduct,
+        "permission_deduct": permission_deduct,
+        "total_deductions": total_deductions,
+        "bonus": bonus,
+        "final_salary": base - total_deductions + bonus,
+    }
+
+
+# Plain Python values of one user's result (for JSON responses)
+def result_at(result, i):
+    return {key: values[i].item() for key, values in result.items()}
+
+
+# Multi-row upsert into the salary table
+def upsert_salary(cursor, user_ids, year, month, days_in_month, result):
+    rows = list(zip(
+        (int(u) for u in user_ids),
+        [month] * len(user_ids),
+        [year] * len(user_ids),
+        [days_in_month] * len(user_ids),
+        result["present"].tolist(),
+        result["paid_leave"].tolist(),
+        result["permission"].tolist(),
+        result["late_deductions"].tolist(),
+        result["early_deductions"].tolist(),
+        result["total_deductions"].tolist(),
+        result["bonus"].tolist(),
+        result["final_salary"].tolist(),
+    ))
+    if rows:
+        psycopg2.extras.execute_values(cursor, UPSERT_SALARY_SQL, rows, page_size=1000)
+    return len(rows)
@@ -0,0 +1,297 @@
+# payroll_jobs.py
+#
+# Month-end payroll as a background job. The staff list is cut into user-id
+# ranges of PAYROLL_PARTITION_SIZE; each range is computed in a separate process
+# (PAYROLL_WORKERS, spawn context) and committed on its own together with the
+# partition's status and its users' salary versions, so a crash only loses the
+# ranges that were in flight and resume_job() picks up the rest. When every
+# range is done the global salary version is bumped and the materialized report
+# refreshed in one last commit.
+#
+# A coordinator thread in the web worker that started the job feeds the pool
+# and finishes the job; progress is read from the payroll_jobs tables, so any
+# worker can answer the status endpoint.
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait as wait_any
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import threading
+import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+
+from db import get_connection
+from models.salary_model import run_payroll_range, finish_payroll
+
+PAYROLL_WORKERS = int(os.getenv("PAYROLL_WORKERS", "2"))
+PAYROLL_PARTITION_SIZE = int(os.getenv("PAYROLL_PARTITION_SIZE", "500"))
+# A running job whose heartbeat has not moved for this long is considered dead and may be resumed
+PAYROLL_STALE_AFTER = int(os.getenv("PAYROLL_STALE_AFTER", "120"))
+# The coordinator touches the job this often while partitions run, so a slow
+# partition does not make a live job look stale
+PAYROLL_HEARTBEAT = float(os.getenv("PAYROLL_HEARTBEAT", str(PAYROLL_STALE_AFTER / 4)))
+
+
+class JobConflict(Exception):
+    pass
+
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    with _lock:
+        if _executor is None or _executor_pid != pid:
+            # spawn, not fork: request workers are multi-threaded
+            _executor = ProcessPoolExecutor(PAYROLL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            _executor_pid = pid
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _lock:
+        _executor = None
+
+
+# Create the job and its user-id ranges; returns the job id.
+# Raises JobConflict (with the running job's id) if the month already has an unfinished job.
+def create_job(month, year):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM users WHERE role = 'user' ORDER BY id")
+        user_ids = [row[0] for row in cursor.fetchall()]
+        ranges = [user_ids[i:i + PAYROLL_PARTITION_SIZE] for i in range(0, len(user_ids), PAYROLL_PARTITION_SIZE)]
+
+        cursor.execute("""
+            INSERT INTO payroll_jobs (year, month, partitions, users_total)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (year, month) WHERE status IN ('pending', 'running') DO NOTHING
+            RETURNING id
+        """, (year, month, len(ranges), len(user_ids)))
+        row = cursor.fetchone()
+        if row is None:
+            conn.rollback()
+            cursor.execute("""
+                SELECT id FROM payroll_jobs
+                WHERE year = %s AND month = %s AND status IN ('pending', 'running')
+            """, (year, month))
+            active = cursor.fetchone()
+            raise JobConflict(active[0] if active else None)
+
+        job_id = row[0]
+        if ranges:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO payroll_job_partitions (job_id, partition, first_user_id, last_user_id, users)
+                VALUES %s
+            """, [(job_id, i, ids[0], ids[-1], len(ids)) for i, ids in enumerate(ranges)])
+        conn.commit()
+        return job_id
+    finally:
+        conn.close()
+
+
+# Runs in a pool process: compute one range and commit it with the job's progress
+def _run_partition(job_id, partition):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE payroll_job_partitions p
+            SET status = 'running', started_at = now(), attempts = attempts + 1, error = NULL
+            FROM payroll_jobs j
+            WHERE p.job_id = j.id AND p.job_id = %s AND p.partition = %s AND p.status <> 'done'
+            RETURNING j.month, j.year, p.first_user_id, p.last_user_id
+        """, (job_id, partition))
+        row = cursor.fetchone()
+        conn.commit()
+        if row is None:
+            return 0
+
+        month, year, first_id, last_id = row
+        users = run_payroll_range(cursor, month, year, first_id, last_id)
+        cursor.execute("""
+            UPDATE payroll_job_partitions SET status = 'done', finished_at = now()
+            WHERE job_id = %s AND partition = %s
+        """, (job_id, partition))
+        cursor.execute("""
+            UPDATE payroll_jobs SET updated_at = now() WHERE id = %s
+        """, (job_id,))
+        conn.commit()
+        return users
+    except Exception as e:
+        # If the connection itself died this fails too; the partition then stays
+        # unfinished for _finish and the original error is what gets raised
+        try:
+            conn.rollback()
+            cursor.execute("""
+                UPDATE payroll_job_partitions SET status = 'failed', error = %s, finished_at = now()
+                WHERE job_id = %s AND partition = %s
+            """, (str(e)[:1000], job_id, partition))
+            conn.commit()
+        except psycopg2.Error:
+            pass
+        raise
+    finally:
+        conn.close()
+
+
+def _finish(job_id, broken=None):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT month, year FROM payroll_jobs WHERE id = %s FOR UPDATE", (job_id,))
+        month, year = cursor.fetchone()
+        cursor.execute("""
+            SELECT COUNT(*) FILTER (WHERE status <> 'done') FROM payroll_job_partitions WHERE job_id = %s
+        """, (job_id,))
+        unfinished = cursor.fetchone()[0]
+        if unfinished or broken:
+            error = broken or f"{unfinished} partition(s) did not finish"
+            cursor.execute("""
+                UPDATE payroll_jobs SET status = 'failed', error = %s, updated_at = now(), finished_at = now()
+                WHERE id = %s
+            """, (error, job_id))
+        else:
+            finish_payroll(cursor, month, year)
+            cursor.execute("""
+                UPDATE payroll_jobs SET status = 'done', error = NULL, updated_at = now(), finished_at = now()
+                WHERE id = %s
+            """, (job_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _heartbeat(job_id):
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE payroll_jobs SET updated_at = now() WHERE id = %s AND status = 'running'", (job_id,))
+        conn.commit()
+    except psycopg2.Error:
+        # A missed beat is harmless; the next one retries
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def _coordinate(job_id, partitions):
+    broken = None
+    try:
+        executor = _get_executor()
+        pending = {executor.submit(_run_partition, job_id, p) for p in partitions}
+        while pending:
+            done, pending = wait_any(pending, timeout=PAYROLL_HEARTBEAT, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    future.result()
+                except BrokenProcessPool as e:
+                    _reset_executor()
+                    broken = f"Worker pool died: {e}"
+                except Exception:
+                    # Recorded on the partition row by _run_partition
+                    pass
+            if pending:
+                _heartbeat(job_id)
+    except Exception as e:
+        broken = str(e)
+    _finish(job_id, broken)
+
+
+# Mark the job running and hand its unfinished partitions to a coordinator thread
+def _launch(job_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE payroll_jobs
+        SET status = 'running', error = NULL, finished_at = NULL,
+            started_at = COALESCE(started_at, now()), updated_at = now()
+        WHERE id = %s
+    """, (job_id,))
+    cursor.execute("""
+        SELECT partition FROM payroll_job_partitions
+        WHERE job_id = %s AND status <> 'done'
+        ORDER BY partition
+    """, (job_id,))
+    partitions = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    conn.close()
+
+    thread = threading.Thread(target=_coordinate, args=(job_id, partitions),
+                              name=f"payroll-job-{job_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+# With wait=True the caller blocks until the job has finished
+def start_job(month, year, wait=False):
+    job_id = create_job(month, year)
+    thread = _launch(job_id)
+    if wait:
+        thread.join()
+    return job_id
+
+
+# Re-run the unfinished partitions of a failed job, or of a running one whose
+# heartbeat has stopped (its coordinator died with the worker that owned it)
+def resume_job(job_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE payroll_jobs SET status = 'pending', updated_at = now()
+            WHERE id = %s AND (
+                status IN ('failed', 'pending')
+                OR (status = 'running' AND updated_at < now() - make_interval(secs => %s))
+            )
+            RETURNING id
+        """, (job_id, PAYROLL_STALE_AFTER))
+        resumed = cursor.fetchone() is not None
+        conn.commit()
+    except psycopg2.errors.UniqueViolation:
+        # Another job for the same month was started meanwhile
+        conn.rollback()
+        resumed = False
+    finally:
+        conn.close()
+    if not resumed:
+        raise JobConflict(job_id)
+    return _launch(job_id)
+
+
+def get_job(job_id):
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT j.id, j.year, j.month, j.status, j.error, j.partitions, j.users_total,
+               COALESCE(SUM(p.users) FILTER (WHERE p.status = 'done'), 0)::int AS users_done,
+               j.created_at, j.started_at, j.updated_at, j.finished_at,
+               COALESCE(EXTRACT(EPOCH FROM COALESCE(j.finished_at, now()) - j.started_at), 0)::float8
+                   AS elapsed_seconds,
+               COUNT(*) FILTER (WHERE p.status = 'done') AS partitions_done,
+               COUNT(*) FILTER (WHERE p.status = 'running') AS partitions_running,
+               COUNT(*) FILTER (WHERE p.status = 'failed') AS partitions_failed
+        FROM payroll_jobs j
+        LEFT JOIN payroll_job_partitions p ON p.job_id = j.id
+        WHERE j.id = %s
+        GROUP BY j.id
+    """, (job_id,))
+    job = cursor.fetchone()
+    conn.close()
+    if job is None:
+        return None
+
+    elapsed = job["elapsed_seconds"]
+    rate = job["users_done"] / elapsed if elapsed > 0 else 0
+    remaining = job["users_total"] - job["users_done"]
+    job["elapsed_seconds"] = round(elapsed, 2)
+    job["users_per_sec"] = round(rate, 1)
+    job["eta_seconds"] = 0 if remaining <= 0 or job["status"] == "done" else (round(remaining / rate, 1) if rate else None)
+    return job
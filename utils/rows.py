@@ -0,0 +1,103 @@
+# rows.py
+#
+# Compact result rows for large reads. RealDictCursor builds an OrderedDict per
+# row (several hundred bytes before the values); RecordCursor returns tuple-backed
+# records instead, which still answer row["date"], row.date, dict(row) and JSON
+# encoding, so handlers written against RealDictCursor keep working.
+#
+# fetch_columns() skips per-row objects entirely and returns one NumPy array per
+# column, read in chunks, for payroll and other aggregate passes.
+
+import os
+import numpy as np
+import psycopg2.extras
+
+# Rows converted per fetchmany() call by fetch_columns()
+COLUMN_CHUNK = int(os.getenv("DB_COLUMN_CHUNK", "10000"))
+
+# Postgres type OIDs with a fixed-width NumPy dtype; anything else is kept as an object array
+COLUMN_DTYPES = {
+    16: np.bool_,                       # bool
+    20: np.int64, 21: np.int64, 23: np.int64,   # int8, int2, int4
+    700: np.float64, 701: np.float64,   # float4, float8
+    1700: np.float64,                   # numeric
+    1082: "datetime64[D]",              # date
+    1114: "datetime64[us]",             # timestamp
+}
+
+
+# Names are looked up in the column index only, so row["count"] or
+# row.get("index") never hand back a tuple method
+def _getitem(self, key):
+    if isinstance(key, str):
+        try:
+            key = self._index[key]
+        except KeyError:
+            raise KeyError(key) from None
+    return tuple.__getitem__(self, key)
+
+
+def _get(self, key, default=None):
+    i = self._index.get(key)
+    return default if i is None else tuple.__getitem__(self, i)
+
+
+def _keys(self):
+    return self._fields
+
+
+# Iterating a record yields values like a tuple; use keys()/dict(row) for the names
+class RecordCursor(psycopg2.extras.NamedTupleCursor):
+    @classmethod
+    def _do_make_nt(cls, key):
+        base = super()._do_make_nt(key)
+        return type("Record", (base,), {
+            "__slots__": (),
+            "_index": {name: i for i, name in enumerate(base._fields)},
+            "__getitem__": _getitem,
+            "get": _get,
+            "keys": _keys,
+        })
+
+
+def _to_array(values, dtype):
+    if dtype is object:
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+    # NULLs in a typed column keep the column as objects: fromiter would quietly
+    # turn None into False (bool), nan (float) or NaT (date)
+    if None in values:
+        return _to_array(values, object)
+    if isinstance(dtype, str):
+        return np.array(values, dtype=dtype)
+    return np.fromiter(values, dtype=dtype, count=len(values))
+
+
+# Fetch the rest of an executed query as {column: array}. Columns listed in
+# `dtypes` use that dtype; the rest are inferred from the column type.
+def fetch_columns(cursor, dtypes=None, size=None):
+    names = [d[0] for d in cursor.description]
+    types = [
+        (dtypes or {}).get(name, COLUMN_DTYPES.get(d[1], object))
+        for name, d in zip(names, cursor.description)
+    ]
+    chunks = [[] for _ in names]
+    while True:
+        rows = cursor.fetchmany(size or COLUMN_CHUNK)
+        if not rows:
+            break
+        for i, values in enumerate(zip(*rows)):
+            chunks[i].append(_to_array(values, types[i]))
+
+    columns = {}
+    for name, dtype, parts in zip(names, types, chunks):
+        if not parts:
+            columns[name] = np.empty(0, dtype=dtype)
+        elif len(parts) == 1:
+            columns[name] = parts[0]
+        else:
+            # An object chunk (NULLs) makes the whole column object
+            columns[name] = np.concatenate(parts) if len({p.dtype for p in parts}) == 1 \
+                else np.concatenate([p.astype(object) for p in parts])
+    return columns
@@ -0,0 +1,217 @@
+# shift_policy.py
+#
+# Late / early rules per batch, from the shift_policies table (migrations/0006).
+# Each policy is compiled once into two seconds-of-day thresholds:
+#
+#   late_after    start_time + late grace; a check-in past it is late, and late
+#                 minutes are counted from it
+#   early_before  end_time - early grace; a check-out before it is early, and
+#                 early minutes are counted up to it
+#
+# Compiled policies are kept in the two-tier cache. Policy writes invalidate it
+# (other workers pick the change up within CACHE_LOCAL_TTL); existing attendance
+# is brought in line with reevaluate_month(), which recomputes a whole month
+# with NumPy and writes back only the rows whose flags or minutes changed.
+
+from datetime import time
+import numpy as np
+import psycopg2.extras
+
+from db import get_connection
+from models import attendance_summary
+from models.user_model import get_user_by_id
+from models.versions import bump
+from utils.cache import cache
+from utils.payroll import month_range
+from utils.rows import fetch_columns
+
+# Batch key of the policy that applies when a batch has none of its own
+DEFAULT_BATCH = "*"
+# Used only if the '*' row is missing
+DEFAULT_POLICY = {"start_time": time(9, 30), "end_time": time(18, 0), "late_grace_minutes": 10, "early_grace_minutes": 10}
+
+POLICY_COLUMNS = "batch, start_time, end_time, late_grace_minutes, early_grace_minutes"
+
+# Times as whole seconds of the day (-1 for NULL) so a month compares as integer arrays
+REEVALUATE_SQL = """
+    SELECT a.id, a.user_id, COALESCE(u.batch, '') AS batch,
+           COALESCE(floor(EXTRACT(EPOCH FROM a.check_in)), -1)::int AS check_in,
+           COALESCE(floor(EXTRACT(EPOCH FROM a.check_out)), -1)::int AS check_out,
+           COALESCE(floor(EXTRACT(EPOCH FROM a.checkin_time)), -1)::int AS checkin_time,
+           COALESCE(floor(EXTRACT(EPOCH FROM a.checkout_time)), -1)::int AS checkout_time,
+           COALESCE(a.late_minutes, 0) AS late_minutes,
+           COALESCE(a.early_minutes, 0) AS early_minutes,
+           COALESCE(a.is_late, FALSE) AS is_late,
+           COALESCE(a.is_early_leave, FALSE) AS is_early_leave
+    FROM attendance a
+    LEFT JOIN users u ON u.id = a.user_id
+    WHERE a.date >= %s AND a.date < %s
+"""
+
+# The date range keeps the update on the month's attendance partition
+UPDATE_FLAGS_SQL = """
+    UPDATE attendance a SET
+        late_minutes = v.late_minutes, early_minutes = v.early_minutes,
+        is_late = v.is_late, is_early_leave = v.is_early_leave
+    FROM unnest(%(ids)s::int[], %(late)s::int[], %(early)s::int[], %(is_late)s::bool[], %(is_early)s::bool[])
+        AS v (id, late_minutes, early_minutes, is_late, is_early_leave)
+    WHERE a.id = v.id AND a.date >= %(start)s AND a.date < %(end)s
+"""
+
+
+def seconds_of_day(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def compile_policy(policy):
+    late_after = seconds_of_day(policy["start_time"]) + policy["late_grace_minutes"] * 60
+    early_before = seconds_of_day(policy["end_time"]) - policy["early_grace_minutes"] * 60
+    return late_after, early_before
+
+
+def _load_compiled():
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute(f"SELECT {POLICY_COLUMNS} FROM shift_policies")
+    compiled = {row["batch"]: compile_policy(row) for row in cursor.fetchall()}
+    conn.close()
+    compiled.setdefault(DEFAULT_BATCH, compile_policy(DEFAULT_POLICY))
+    return compiled
+
+
+# {batch: (late_after, early_before)} for every policy, including DEFAULT_BATCH
+def compiled_policies():
+    return cache.get_or_load("shift_policy:compiled", _load_compiled)
+
+
+def thresholds(batch):
+    compiled = compiled_policies()
+    return compiled.get(batch) or compiled[DEFAULT_BATCH]
+
+
+def user_thresholds(user_id):
+    user = get_user_by_id(user_id)
+    return thresholds(user.get("batch") if user else None)
+
+
+# Late minutes for a check-in by user_id at check_in_time (0 when on time)
+def late_minutes(user_id, check_in_time):
+    late_after, _ = user_thresholds(user_id)
+    return max(0, seconds_of_day(check_in_time) - late_after) // 60
+
+
+def early_minutes(user_id, check_out_time):
+    _, early_before = user_thresholds(user_id)
+    return max(0, early_before - seconds_of_day(check_out_time)) // 60
+
+
+def is_late(user_id, check_in_time):
+    late_after, _ = user_thresholds(user_id)
+    return seconds_of_day(check_in_time) > late_after
+
+
+def is_early_leave(user_id, check_out_time):
+    _, early_before = user_thresholds(user_id)
+    return seconds_of_day(check_out_time) < early_before
+
+
+def list_policies():
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute(f"SELECT {POLICY_COLUMNS}, updated_at FROM shift_policies ORDER BY batch")
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+# Create or replace the policy for a batch. Raises ValueError for an unusable schedule.
+def set_policy(batch, start_time, end_time, late_grace_minutes=10, early_grace_minutes=10):
+    policy = {"start_time": start_time, "end_time": end_time,
+              "late_grace_minutes": late_grace_minutes, "early_grace_minutes": early_grace_minutes}
+    if late_grace_minutes < 0 or early_grace_minutes < 0:
+        raise ValueError("Grace minutes cannot be negative")
+    late_after, early_before = compile_policy(policy)
+    if late_after >= early_before:
+        raise ValueError("Shift must end after it starts (grace periods included)")
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        INSERT INTO shift_policies ({POLICY_COLUMNS})
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (batch) DO UPDATE SET
+            start_time = EXCLUDED.start_time,
+            end_time = EXCLUDED.end_time,
+            late_grace_minutes = EXCLUDED.late_grace_minutes,
+            early_grace_minutes = EXCLUDED.early_grace_minutes,
+            updated_at = now()
+    """, (batch, start_time, end_time, late_grace_minutes, early_grace_minutes))
+    conn.commit()
+    conn.close()
+    cache.invalidate("shift_policy")
+
+
+# Remove a batch's own policy so it falls back to DEFAULT_BATCH. Returns False if there was none.
+def delete_policy(batch):
+    if batch == DEFAULT_BATCH:
+        raise ValueError("The default policy cannot be deleted")
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM shift_policies WHERE batch = %s", (batch,))
+    deleted = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    cache.invalidate("shift_policy")
+    return deleted
+
+
+# Per-row (late_after, early_before) arrays for a column of batch names
+def _row_thresholds(batches):
+    compiled = compiled_policies()
+    names, inverse = np.unique(batches.astype(str), return_inverse=True)
+    table = np.array([compiled.get(name) or compiled[DEFAULT_BATCH] for name in names], dtype=np.int64)
+    table = table.reshape(len(names), 2)
+    return table[inverse, 0], table[inverse, 1]
+
+
+# Recompute late/early minutes and flags for a month under the current policies.
+# Rows without a check-in / check-out time keep their stored values. The payroll
+# dirty triggers mark the affected users; the monthly summary is rebuilt.
+def reevaluate_month(year, month):
+    start, end = month_range(year, month)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(REEVALUATE_SQL, (start, end))
+    cols = fetch_columns(cursor)
+    rows = len(cols["id"])
+    if not rows:
+        conn.close()
+        return {"rows": 0, "changed": 0, "users": 0}
+
+    late_after, early_before = _row_thresholds(cols["batch"])
+
+    def recompute(seconds, old, value):
+        return np.where(seconds >= 0, value, old)
+
+    late = recompute(cols["check_in"], cols["late_minutes"], np.maximum(0, cols["check_in"] - late_after) // 60)
+    early = recompute(cols["check_out"], cols["early_minutes"],
+                      np.maximum(0, early_before - cols["check_out"]) // 60)
+    is_late = recompute(cols["checkin_time"], cols["is_late"], cols["checkin_time"] > late_after)
+    is_early = recompute(cols["checkout_time"], cols["is_early_leave"], cols["checkout_time"] < early_before)
+
+    changed = ((late != cols["late_minutes"]) | (early != cols["early_minutes"])
+               | (is_late != cols["is_late"]) | (is_early != cols["is_early_leave"]))
+    users = np.unique(cols["user_id"][changed])
+    if len(users):
+        cursor.execute(UPDATE_FLAGS_SQL, {
+            "ids": cols["id"][changed].tolist(), "late": late[changed].tolist(), "early": early[changed].tolist(),
+            "is_late": is_late[changed].tolist(), "is_early": is_early[changed].tolist(),
+            "start": start, "end": end,
+        })
+        bump(cursor, "attendance_version", users.tolist())
+    conn.commit()
+    conn.close()
+
+    if len(users):
+        attendance_summary.rebuild(year, month)
+    return {"rows": rows, "changed": int(changed.sum()), "users": len(users)}